@@ -0,0 +1,606 @@
+"""Offline benchmark for the download backend.
+
+Runs the FastAPI app in-process against local stand-ins for the YouTube Data API
+and for media hosts, drives /start-download and /progress from simulated clients,
+and emits a JSON report that can be compared against a previous run.
+
+    python benchmark.py --clients 4 --videos 25 --output results.json
+    python benchmark.py --baseline results.json --tolerance 0.15
+    python benchmark.py --import-only --import-budget 0.5
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, WSMsgType, web
+
+logger = logging.getLogger("benchmark")
+
+# Terminal job states reported by GET /jobs/{job_id}
+FINISHED_JOB_STATES = ("completed", "completed_with_errors", "cancelled")
+JOB_POLL_INTERVAL = 0.5
+# Item statuses sent once a video's transfer has completed; frames coalesce events, so a short transfer
+# can reach the client as one of these without any earlier "downloading" event
+TRANSFERRED_STATUSES = ("finished", "processing", "processed")
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+# Metrics compared against a baseline and whether higher values are better
+REGRESSION_CHECKS = {
+    ("throughput", "bytes_per_second"): True,
+    ("throughput", "videos_per_second"): True,
+    ("time_to_first_byte", "p50"): False,
+    ("time_to_first_byte", "p99"): False,
+    ("video_latency", "p50"): False,
+    ("video_latency", "p99"): False,
+    ("resources", "peak_rss_bytes"): False,
+    ("startup", "import_seconds"): False
+}
+IMPORT_RUNS = 3  # Fresh interpreters per import measurement; the median is reported
+
+# Local stand-ins
+def fake_video_id(seed: str, index: int) -> str:
+    """Deterministic 11-character ID in the YouTube alphabet"""
+    return hashlib.sha256(f"{seed}:{index}".encode()).hexdigest()[:11]
+
+def api_page(request: web.Request, seed: str, total: int, make_item) -> web.Response:
+    """Page through `total` synthetic videos honouring maxResults, pageToken and If-None-Match"""
+    page_size = min(int(request.query.get("maxResults", "5")), 50)
+    offset = int(request.query.get("pageToken") or 0)
+    end = min(offset + page_size, total)
+    etag = hashlib.md5(f"{seed}:{offset}:{end}".encode()).hexdigest()
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304)
+    body = {
+        "kind": "youtube#listResponse",
+        "etag": etag,
+        "pageInfo": {"totalResults": total, "resultsPerPage": page_size},
+        "items": [make_item(fake_video_id(seed, index)) for index in range(offset, end)]
+    }
+    if end < total:
+        body["nextPageToken"] = str(end)
+    return web.json_response(body, headers={"ETag": etag})
+
+def create_api_app(config: dict) -> web.Application:
+    """Stand-in for the Data API endpoints used by main.py"""
+    stats = {"requests": {}, "errors": 0}
+    total = config["videos"]
+
+    async def handle(request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        stats["requests"][endpoint] = stats["requests"].get(endpoint, 0) + 1
+        if config["api_latency"]:
+            await asyncio.sleep(config["api_latency"])
+        if random.random() < config["api_error_rate"]:
+            stats["errors"] += 1
+            return web.json_response(
+                {"error": {"code": 503, "message": "Backend Error", "errors": [{"reason": "backendError"}]}},
+                status=503
+            )
+
+        if endpoint == "search":
+            seed = f"search:{request.query.get('q')}:{request.query.get('videoCategoryId')}"
+            return api_page(request, seed, total, lambda video_id: {
+                "kind": "youtube#searchResult",
+                "id": {"kind": "youtube#video", "videoId": video_id}
+            })
+        if endpoint == "playlistItems":
+            seed = f"playlist:{request.query.get('playlistId')}:{request.headers.get('Authorization')}"
+            return api_page(request, seed, total, lambda video_id: {
+                "kind": "youtube#playlistItem",
+                "contentDetails": {"videoId": video_id}
+            })
+        if endpoint == "activities":
+            seed = f"activities:{request.headers.get('Authorization')}"
+            return api_page(request, seed, total, lambda video_id: {
+                "kind": "youtube#activity",
+                "contentDetails": {"upload": {"videoId": video_id}}
+            })
+        if endpoint == "videos":
+            video_ids = [video_id for video_id in request.query.get("id", "").split(",") if video_id]
+            return web.json_response({
+                "kind": "youtube#videoListResponse",
+                "items": [{
+                    "kind": "youtube#video",
+                    "id": video_id,
+                    "snippet": {"title": f"Benchmark video {video_id}", "liveBroadcastContent": "none"},
+                    # Spread over 1 to 20 minutes and 0 to 999999 views
+                    "contentDetails": {"duration": f"PT{int(video_id[:4], 16) % 20 + 1}M", "contentRating": {}},
+                    "statistics": {"viewCount": str(int(video_id[4:10], 16) % 1000000)}
+                } for video_id in video_ids]
+            })
+        if endpoint == "channels":
+            return web.json_response({
+                "kind": "youtube#channelListResponse",
+                "items": [{
+                    "id": "UCbenchmark",
+                    "snippet": {
+                        "title": "Benchmark Channel",
+                        "thumbnails": {"default": {"url": "http://127.0.0.1/thumbnail.jpg"}}
+                    }
+                }]
+            })
+        return web.json_response({"error": {"code": 404, "message": f"Unknown endpoint {endpoint}"}}, status=404)
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/_stats", get_stats)
+    app.router.add_get("/youtube/v3/{endpoint}", handle)
+    return app
+
+def create_media_app(config: dict) -> web.Application:
+    """Stand-in media host serving synthetic files at a configurable speed and error rate"""
+    stats = {"requests": 0, "errors": 0, "bytes_served": 0}
+    size = config["size"]
+
+    async def serve(request: web.Request) -> web.StreamResponse:
+        stats["requests"] += 1
+        if random.random() < config["error_rate"]:
+            stats["errors"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+
+        start, end = 0, size - 1
+        status = 200
+        range_header = request.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            first, _, last = range_header[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+            status = 206
+
+        headers = {
+            "Content-Type": "video/mp4",
+            "Content-Length": str(end - start + 1),
+            "Accept-Ranges": "bytes"
+        }
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response = web.StreamResponse(status=status, headers=headers)
+        if config["ttfb"]:
+            await asyncio.sleep(config["ttfb"])
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        # Repeating pattern derived from the path so every file has distinct content
+        pattern = hashlib.sha256(request.path.encode()).digest() * (MEDIA_CHUNK_SIZE // 32)
+        position = start
+        while position <= end:
+            chunk_size = min(MEDIA_CHUNK_SIZE, end - position + 1)
+            offset = position % MEDIA_CHUNK_SIZE
+            chunk = (pattern[offset:] + pattern[:offset])[:chunk_size]
+            try:
+                await response.write(chunk)
+            except ConnectionResetError:
+                break
+            stats["bytes_served"] += chunk_size
+            position += chunk_size
+            if config["speed"]:
+                await asyncio.sleep(chunk_size / config["speed"])
+        return response
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/_stats", get_stats)
+    app.router.add_route("*", "/media/{name}", serve)
+    return app
+
+def listening_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(128)
+    return sock
+
+def run_stand_ins(config: dict, port_queue):
+    """Serve both stand-ins in a child process so their CPU time is not charged to the app"""
+    random.seed(config["seed"])
+
+    async def serve():
+        ports = {}
+        for name, app in (("api", create_api_app(config)), ("media", create_media_app(config))):
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            sock = listening_socket()
+            await web.SockSite(runner, sock).start()
+            ports[name] = sock.getsockname()[1]
+        port_queue.put(ports)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+# Load driver
+def percentiles(values: List[float]) -> dict:
+    """Nearest-rank percentiles"""
+    if not values:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered)
+    }
+
+def folder_bytes(folder: str) -> int:
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith((".part", ".ytdl")):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+async def run_client(index: int, base_url: str, config: dict, work_dir: str) -> dict:
+    """Sign a simulated client in, start one job and follow it to completion"""
+    from google.oauth2.credentials import Credentials
+    import main
+
+    client_id = f"benchmark{index:04d}{os.urandom(4).hex()}"
+    await main.credential_manager.store(client_id, Credentials(token=f"benchmark-{index}"))
+    folder = os.path.join(work_dir, "downloads", client_id)
+    os.makedirs(folder, exist_ok=True)
+
+    first_bytes: Dict[str, float] = {}
+    frames = 0
+    events = 0
+    async with ClientSession(headers={"Cookie": f"client_id={client_id}"}) as session:
+        ws = await session.ws_connect(f"{base_url}/progress")
+
+        async def follow_progress():
+            nonlocal frames, events
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    break
+                frame = json.loads(message.data)
+                frames += 1
+                for item in frame.get("items", []):
+                    events += 1
+                    transferred = item.get("downloaded_bytes") or item.get("status") in TRANSFERRED_STATUSES
+                    if transferred and item.get("video_id") not in first_bytes:
+                        first_bytes[item["video_id"]] = time.monotonic()
+
+        reader = asyncio.create_task(follow_progress())
+        submitted = time.monotonic()
+        async with session.post(f"{base_url}/start-download", json={
+            "query": f"benchmark {index}",
+            "useWatchLater": config["watch_later"],
+            "numVideos": config["videos"],
+            "folder": folder,
+            "quality": "best",
+            "priority": config["priority"]
+        }) as response:
+            body = await response.json()
+            if response.status != 200:
+                raise RuntimeError(f"start-download failed with {response.status}: {body}")
+        job_id = body["job_id"]
+
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            async with session.get(f"{base_url}/jobs/{job_id}") as response:
+                job = await response.json()
+            if job["status"] in FINISHED_JOB_STATES:
+                break
+        finished = time.monotonic()
+        # The last coalesced frame goes out up to one interval after the job settles
+        await asyncio.sleep(2 * main.PROGRESS_INTERVAL)
+        await ws.close()
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+    latencies = []
+    for item in job["items"]:
+        if item["status"] == "finished" and item["finished_at"]:
+            created = datetime.fromisoformat(item["created_at"])
+            latencies.append((datetime.fromisoformat(item["finished_at"]) - created).total_seconds())
+    return {
+        "client_id": client_id,
+        "job_id": job_id,
+        "status": job["status"],
+        "counts": job.get("counts", {}),
+        "job_seconds": finished - submitted,
+        "time_to_first_byte": [t - submitted for t in first_bytes.values()],
+        "video_latency": latencies,
+        "bytes": folder_bytes(folder),
+        "frames": frames,
+        "events": events
+    }
+
+async def drive(config: dict, work_dir: str, api_port: int, media_port: int) -> dict:
+    import uvicorn
+    import main
+
+    sock = listening_socket()
+    base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    try:
+        results = await asyncio.gather(*(
+            run_client(index, base_url, config, work_dir) for index in range(config["clients"])
+        ))
+        wall = time.monotonic() - started
+        async with ClientSession(headers={"Cookie": f"client_id={results[0]['client_id']}"}) as session:
+            async with session.get(f"{base_url}/pipeline/stats") as response:
+                pipeline = await response.json()
+            async with session.get(f"http://127.0.0.1:{api_port}/_stats") as response:
+                api_stats = await response.json()
+            async with session.get(f"http://127.0.0.1:{media_port}/_stats") as response:
+                media_stats = await response.json()
+    finally:
+        server.should_exit = True
+        await serving
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        for status, count in result["counts"].items():
+            counts[status] = counts.get(status, 0) + count
+    total_bytes = sum(result["bytes"] for result in results)
+    completed = counts.get("finished", 0)
+    return {
+        "videos": dict(counts, requested=config["clients"] * config["videos"]),
+        "wall_seconds": wall,
+        "throughput": {
+            "videos_per_second": completed / wall if wall else 0,
+            "bytes_per_second": total_bytes / wall if wall else 0,
+            "bytes": total_bytes
+        },
+        "time_to_first_byte": percentiles([t for r in results for t in r["time_to_first_byte"]]),
+        "video_latency": percentiles([t for r in results for t in r["video_latency"]]),
+        "job_latency": percentiles([r["job_seconds"] for r in results]),
+        "progress": {
+            "frames": sum(result["frames"] for result in results),
+            "events": sum(result["events"] for result in results)
+        },
+        "resources": {
+            "cpu_user_seconds": usage.ru_utime - usage_before.ru_utime,
+            "cpu_system_seconds": usage.ru_stime - usage_before.ru_stime,
+            "worker_process_cpu_seconds": (
+                children.ru_utime + children.ru_stime - children_before.ru_utime - children_before.ru_stime
+            ),
+            # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+            "peak_rss_bytes": usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        },
+        "pipeline": pipeline,
+        "stand_ins": {"api": api_stats, "media": media_stats}
+    }
+
+# Startup
+def measure_import_time(work_dir: str, runs: int = IMPORT_RUNS) -> dict:
+    """Median wall time of `import main` in fresh interpreters, with the slowest top-level imports"""
+    env = dict(
+        os.environ,
+        ARCHIVE_PATH=os.path.join(work_dir, "import-archive.sqlite3"),
+        JOURNAL_PATH=os.path.join(work_dir, "import-journal.sqlite3"),
+        STATE_PATH=os.path.join(work_dir, "import-state.sqlite3"),
+        SYNC_PATH=os.path.join(work_dir, "import-sync.sqlite3")
+    )
+    durations = []
+    modules: Dict[str, int] = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        durations.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            raise RuntimeError(f"import main failed: {result.stderr.strip().splitlines()[-1:]}")
+        # Lines look like "import time: self [us] | cumulative | imported package", nested two spaces per level
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            name = parts[2].rstrip()
+            # Direct imports of main.py sit one level below it
+            if name.startswith("   ") and not name.startswith("    "):
+                modules[name.strip()] = max(modules.get(name.strip(), 0), int(parts[1]))
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {
+        "import_seconds": sorted(durations)[len(durations) // 2],
+        "slowest_imports": [{"module": name, "seconds": micros / 1e6} for name, micros in slowest]
+    }
+
+# Reporting
+@contextmanager
+def stdout_to_stderr():
+    """Point file descriptor 1 at stderr, including for child processes started meanwhile"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> List[dict]:
+    regressions = []
+    for (section, key), higher_is_better in REGRESSION_CHECKS.items():
+        current = report.get(section, {}).get(key)
+        previous = baseline.get(section, {}).get(key)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append({
+                "metric": f"{section}.{key}",
+                "baseline": previous,
+                "current": current,
+                "change": change
+            })
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the download backend against local stand-ins")
+    parser.add_argument("--clients", type=int, default=4, help="Simulated signed-in clients, one job each")
+    parser.add_argument("--videos", type=int, default=25, help="Videos per job")
+    parser.add_argument("--size", type=int, default=2 * 1024 * 1024, help="Bytes per synthetic video")
+    parser.add_argument("--speed", type=float, default=0, help="Bytes per second per media stream; 0 is unlimited")
+    parser.add_argument("--ttfb", type=float, default=0, help="Seconds before the media host sends the first byte")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of media requests answered with 503")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Seconds added to every API response")
+    parser.add_argument("--api-error-rate", type=float, default=0, help="Fraction of API requests answered with 503")
+    parser.add_argument("--watch-later", action="store_true", help="Also resolve the Watch Later source")
+    parser.add_argument("--priority", choices=("interactive", "normal", "bulk"), default="normal")
+    parser.add_argument("--engine", choices=("thread", "process"), help="DOWNLOAD_ENGINE for the run")
+    parser.add_argument("--workers", type=int, help="DOWNLOAD_WORKERS for the run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected errors")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    parser.add_argument("--import-budget", type=float, help="Fail when importing main.py takes longer, in seconds")
+    parser.add_argument("--import-only", action="store_true", help="Only measure import time, without the load run")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    config = {
+        "clients": args.clients,
+        "videos": args.videos,
+        "size": args.size,
+        "speed": args.speed,
+        "ttfb": args.ttfb,
+        "error_rate": args.error_rate,
+        "api_latency": args.api_latency,
+        "api_error_rate": args.api_error_rate,
+        "watch_later": args.watch_later,
+        "priority": args.priority,
+        "seed": args.seed
+    }
+
+    with tempfile.TemporaryDirectory(prefix="ytdl-import-") as import_dir:
+        startup = measure_import_time(import_dir)
+
+    if args.import_only:
+        return finish_report(args, config, {}, {"startup": startup})
+
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    stand_ins = context.Process(target=run_stand_ins, args=(config, port_queue), daemon=True)
+    stand_ins.start()
+    try:
+        ports = port_queue.get(timeout=30)
+    except queue.Empty:
+        logger.error("Stand-in servers did not start")
+        stand_ins.terminate()
+        return 2
+
+    with tempfile.TemporaryDirectory(prefix="ytdl-benchmark-") as work_dir:
+        # main.py reads its configuration at import time
+        os.environ.update({
+            "YOUTUBE_API_ENDPOINT": f"http://127.0.0.1:{ports['api']}/youtube/v3/",
+            "WATCH_URL_TEMPLATE": f"http://127.0.0.1:{ports['media']}/media/{{video_id}}.mp4?v={{video_id}}",
+            "ARCHIVE_PATH": os.path.join(work_dir, "archive.sqlite3"),
+            "JOURNAL_PATH": os.path.join(work_dir, "journal.sqlite3"),
+            "STATE_PATH": os.path.join(work_dir, "state.sqlite3"),
+            "SYNC_PATH": os.path.join(work_dir, "sync.sqlite3")
+        })
+        if args.engine:
+            os.environ["DOWNLOAD_ENGINE"] = args.engine
+        if args.workers:
+            os.environ["DOWNLOAD_WORKERS"] = str(args.workers)
+        environment = {
+            name: os.environ[name]
+            for name in ("DOWNLOAD_ENGINE", "DOWNLOAD_WORKERS", "DOWNLOAD_MAX_WORKERS", "METADATA_WORKERS",
+                         "TRANSFER_QUEUE_SIZE", "CLIENT_CONCURRENCY", "API_CONCURRENCY", "BANDWIDTH_LIMIT",
+                         "PROGRESS_INTERVAL")
+            if name in os.environ
+        }
+        try:
+            # yt-dlp and worker processes write to stdout, which carries only the report
+            with stdout_to_stderr():
+                results = asyncio.run(drive(config, work_dir, ports["api"], ports["media"]))
+        finally:
+            stand_ins.terminate()
+
+    results["startup"] = startup
+    return finish_report(args, config, environment, results)
+
+def finish_report(args: argparse.Namespace, config: dict, environment: dict, results: dict) -> int:
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "config": config,
+        "environment": environment,
+        **results
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = {"revision": baseline.get("revision"), "tolerance": args.tolerance}
+        report["regressions"] = find_regressions(report, baseline, args.tolerance)
+        if report["regressions"]:
+            exit_code = 1
+    if args.import_budget is not None:
+        report["startup"]["budget"] = args.import_budget
+        if report["startup"]["import_seconds"] > args.import_budget:
+            exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for regression in report.get("regressions", []):
+        logger.warning(
+            f"Regression in {regression['metric']}: {regression['baseline']:.4g} -> "
+            f"{regression['current']:.4g} ({regression['change']:+.1%})"
+        )
+    if args.import_budget is not None and report["startup"]["import_seconds"] > args.import_budget:
+        logger.warning(
+            f"Importing main.py took {report['startup']['import_seconds']:.3f}s, over the "
+            f"{args.import_budget:.3f}s budget"
+        )
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
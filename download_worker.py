@@ -0,0 +1,196 @@
+"""yt-dlp options and transfer helpers shared by the download engines, and the worker process loop.
+
+Worker processes are spawned with this module as their entry point, so importing it must stay free of side effects.
+"""
+import ctypes
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FILENAME_TEMPLATE = "%(title)s [%(id)s].%(ext)s"  # The video id keeps equal titles from overwriting each other
+STAGING_DIR = ".ytdl-staging"  # Inside the download folder, so finished files move into place with a rename
+PROGRESS_FIELDS = ('status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate', 'speed', 'eta')
+PROCESS_PROGRESS_INTERVAL = 0.1  # Seconds between progress messages sent by a worker process
+
+def build_ydl_options(task: dict, progress_hooks: list) -> dict:
+    if task.get('preallocate'):
+        progress_hooks = progress_hooks + [create_preallocate_hook()]
+    return {
+        'paths': {'home': task['folder'], 'temp': STAGING_DIR},
+        'outtmpl': FILENAME_TEMPLATE,
+        'format': task['format'],
+        'continuedl': True,  # Resume .part files left behind by an interrupted run
+        'progress_hooks': progress_hooks,
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': False
+    }
+
+def run_extract(ydl, task: dict) -> dict:
+    """Resolve a video's metadata and formats without downloading it"""
+    info = ydl.extract_info(task['url'], download=False)
+    # Plain data only, so it can cross process boundaries
+    return ydl.sanitize_info(info)
+
+_transfer_only_class = None
+
+def transfer_only_ydl(params: dict):
+    """YoutubeDL that stops after the transfer, leaving merging and other post-processing to the post-processing stage"""
+    global _transfer_only_class
+    # Defined on first use so yt-dlp is only imported when a download starts
+    if _transfer_only_class is None:
+        import yt_dlp
+
+        class TransferOnlyYoutubeDL(yt_dlp.YoutubeDL):
+            def post_process(self, filename, info, files_to_move=None):
+                info['filepath'] = filename
+                info['__deferred_parts'] = info.get('__files_to_merge') or []
+                return info
+
+        _transfer_only_class = TransferOnlyYoutubeDL
+    return _transfer_only_class(params)
+
+def run_download(ydl, task: dict) -> dict:
+    """Download a video, from pre-extracted info when available, and describe the files to post-process"""
+    if task.get('info'):
+        info = ydl.process_ie_result(task['info'], download=True)
+    else:
+        info = ydl.extract_info(task['url'], download=True)
+    download = (info.get('requested_downloads') or [info])[0]
+    thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+    jpeg_thumbnails = [t for t in thumbnails if t['url'].split('?')[0].endswith('.jpg')]
+    return {
+        'filepath': download.get('filepath') or ydl.prepare_filename(info, 'temp'),
+        'parts': download.get('__deferred_parts') or [],
+        'home': task['folder'],
+        'metadata': {
+            'title': info.get('title'),
+            'uploader': info.get('uploader'),
+            'upload_date': info.get('upload_date'),
+            'webpage_url': info.get('webpage_url'),
+            'acodec': info.get('acodec'),
+            'thumbnail': (jpeg_thumbnails or thumbnails or [{}])[-1].get('url') or info.get('thumbnail')
+        }
+    }
+
+class RateThrottle:
+    """Token bucket enforced from a yt-dlp progress hook by sleeping in the transfer thread"""
+
+    def __init__(self, get_rate):
+        self.get_rate = get_rate
+        self.reset()
+
+    def reset(self):
+        self._tokens = 0.0
+        self._last_time = time.monotonic()
+        self._last_bytes = 0
+
+    def __call__(self, d):
+        if d.get('status') != 'downloading':
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        # Counters restart for each stream of a merged format
+        delta = downloaded - self._last_bytes if downloaded >= self._last_bytes else downloaded
+        self._last_bytes = downloaded
+
+        now = time.monotonic()
+        rate = self.get_rate()
+        if not rate:
+            self._tokens = 0.0
+            self._last_time = now
+            return
+
+        # Allow at most one second of burst
+        self._tokens = min(rate, self._tokens + (now - self._last_time) * rate) - delta
+        self._last_time = now
+        if self._tokens < 0:
+            time.sleep(-self._tokens / rate)
+            self._tokens = 0.0
+            self._last_time = time.monotonic()
+
+FALLOC_FL_KEEP_SIZE = 0x01
+_fallocate = None
+
+def preallocate(path: str, size: int):
+    """Reserve a file's blocks without changing its size, so yt-dlp's appending writes stay contiguous"""
+    global _fallocate
+    if _fallocate is None:
+        try:
+            _fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+        except (AttributeError, OSError):
+            # Not Linux: preallocation is skipped
+            _fallocate = False
+    if not _fallocate:
+        return
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        _fallocate(fd, FALLOC_FL_KEEP_SIZE, ctypes.c_longlong(0), ctypes.c_longlong(size))
+    finally:
+        os.close(fd)
+
+def create_preallocate_hook():
+    allocated = set()
+
+    def hook(d):
+        path = d.get('tmpfilename')
+        total = d.get('total_bytes')
+        if d.get('status') != 'downloading' or not path or not total or path in allocated:
+            if d.get('status') == 'finished':
+                allocated.discard(path)
+            return
+        allocated.add(path)
+        try:
+            preallocate(path, total)
+        except OSError as e:
+            logger.debug(f"Preallocation of {path} failed: {e}")
+
+    return hook
+
+def process_worker_main(task_queue, result_queue, cancel_event, rate_limit, max_instances: int = 4):
+    """Worker process loop: keeps YoutubeDL instances warm and streams progress back"""
+    import yt_dlp
+
+    current = {'task_id': None, 'last_progress': 0.0}
+    instances: OrderedDict = OrderedDict()
+    throttle = RateThrottle(lambda: rate_limit.value)
+
+    def hook(d):
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled()
+        throttle(d)
+        now = time.monotonic()
+        if d.get('status') == 'downloading' and now - current['last_progress'] < PROCESS_PROGRESS_INTERVAL:
+            return
+        current['last_progress'] = now
+        result_queue.put(('progress', current['task_id'], {field: d.get(field) for field in PROGRESS_FIELDS}))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        current['task_id'] = task['task_id']
+        throttle.reset()
+        try:
+            # Instances are reused per output folder and format so extractor state stays warm
+            key = (task['folder'], task['format'])
+            ydl = instances.get(key)
+            if ydl is None:
+                ydl = transfer_only_ydl(build_ydl_options(task, [hook]))
+                instances[key] = ydl
+                while len(instances) > max_instances:
+                    instances.popitem(last=False)[1].close()
+            instances.move_to_end(key)
+            if task['kind'] == 'extract':
+                result = run_extract(ydl, task)
+            else:
+                result = run_download(ydl, task)
+            result_queue.put(('done', task['task_id'], result))
+        except BaseException as e:
+            result_queue.put(('error', task['task_id'], str(e)))
+
+    for ydl in instances.values():
+        ydl.close()
@@ -1,29 +1,47 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Depends, Response
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Depends, Response, Query
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
-import yt_dlp
+from pydantic import BaseModel, Field
 import os
 import asyncio
 import json
-import warnings
-import googleapiclient.discovery
-from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token
-from google.auth.transport.requests import Request as GoogleRequest
-from google.auth.transport import requests
+from google.auth.exceptions import RefreshError
 import logging
+import importlib
+import importlib.util
+import sys
 from pathlib import Path
 from typing import Optional, Dict, List
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import aiohttp
+from download_worker import (
+    STAGING_DIR, RateThrottle, build_ydl_options, process_worker_main, run_download, run_extract, transfer_only_ydl
+)
+from postprocess import file_checksum, run_postprocess
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 from starlette.middleware.sessions import SessionMiddleware
 import base64
 import json
+import sqlite3
+import threading
+import queue
+import multiprocessing
+import random
+import re
+import time
+import shutil
+import email.utils
+import socket
+from collections import OrderedDict, deque
+from urllib.parse import urlparse, parse_qs
 
 def encode_state(client_id: str) -> str:
     """Encode client ID and other state information"""
@@ -50,19 +68,31 @@ def decode_state(state: str) -> dict:
         logger.error(f"Error decoding state: {e}")
         return {}
 
-# Enhanced logging setup
+# Set up logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-# Filter out googleapiclient warning
-warnings.filterwarnings('ignore', message='file_cache is only supported with oauth2client<4.0.0')
+class LazyModule:
+    """Module proxy that imports the module on first attribute access"""
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# Heavy imports are deferred so the server starts listening quickly
+yt_dlp = LazyModule("yt_dlp")
+google_jwt = LazyModule("google.auth.jwt")
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -90,7 +120,18 @@ app.add_middleware(
 
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
+    started = time.perf_counter()
     response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.observe(
+        "ytdl_http_request_duration_seconds",
+        elapsed,
+        method=request.method,
+        path=route.path if route else "unmatched"
+    )
+    if TIMING_HEADERS:
+        response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.2f}"
     response.headers["X-Content-Type-Options"] = "nosniff"
     response.headers["X-Frame-Options"] = "DENY"
     response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
@@ -108,6 +149,131 @@ SCOPES = [
 
 REDIRECT_URI = "http://localhost:8000/auth/callback"
 CLIENT_SECRETS_FILE = "credentials.json"
+TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry at which tokens are renewed in the background
+TOKEN_REFRESH_INTERVAL = 30  # Seconds between scans for expiring tokens
+TOKEN_REFRESH_WORKERS = 2  # Threads performing token refreshes
+PROFILE_CACHE_TTL = int(os.environ.get("PROFILE_CACHE_TTL", "600"))  # Seconds a resolved user profile is reused
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+CERT_CACHE_DEFAULT_TTL = 3600  # Seconds certs are kept when the response has no cache headers
+
+YOUTUBE_PAGE_SIZE = 50  # API maximum for maxResults
+YOUTUBE_API_ENDPOINT = os.environ.get("YOUTUBE_API_ENDPOINT", "https://www.googleapis.com/youtube/v3/")
+API_CONNECTION_LIMIT = int(os.environ.get("API_CONNECTION_LIMIT", "20"))  # Pooled keep-alive connections to the Data API
+API_TIMEOUT = 30.0  # Seconds per Data API request
+API_KEEPALIVE_TIMEOUT = 60.0  # Seconds idle connections are kept open
+API_DAILY_QUOTA = int(os.environ.get("API_DAILY_QUOTA", "10000"))  # Quota units per day of the API project
+QUOTA_TIMEZONE = timezone(timedelta(hours=-8))  # Quota resets at midnight Pacific time (standard time)
+WATCH_URL_TEMPLATE = os.environ.get("WATCH_URL_TEMPLATE", "https://www.youtube.com/watch?v={video_id}")
+
+# API response cache settings
+API_CACHE_SIZE = int(os.environ.get("API_CACHE_SIZE", "1024"))
+API_CACHE_TTLS = {  # Seconds a response is served without revalidation
+    "search": 600,
+    "playlistItems": 60,
+    "activities": 120,
+    "videos": 600
+}
+
+# Progress settings
+PROGRESS_INTERVAL = float(os.environ.get("PROGRESS_INTERVAL", "0.25"))  # Seconds between frames
+
+# Download settings
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+# Transfer workers spawned; adaptive concurrency lets up to this many run while throughput keeps rising
+DOWNLOAD_MAX_WORKERS = max(DOWNLOAD_WORKERS, int(os.environ.get("DOWNLOAD_MAX_WORKERS", str(DOWNLOAD_WORKERS * 2))))
+DOWNLOAD_ENGINE = os.environ.get("DOWNLOAD_ENGINE", "thread")  # "thread" or "process"
+WORKER_CHECK_INTERVAL = 1.0  # Seconds between liveness checks of download worker processes
+METADATA_WORKERS = int(os.environ.get("METADATA_WORKERS", "4"))
+TRANSFER_QUEUE_SIZE = int(os.environ.get("TRANSFER_QUEUE_SIZE", "8"))  # Extracted videos waiting for a download slot
+ACTIVE_ITEM_STATES = ("queued", "extracting", "ready", "downloading", "processing")
+
+# Disk settings
+DISK_HEADROOM = int(os.environ.get("DISK_HEADROOM", str(512 * 1024 * 1024)))  # Bytes always left free
+FOLDER_QUOTA = int(os.environ.get("FOLDER_QUOTA", "0"))  # Default bytes per download folder; 0 is unlimited
+DISK_PREALLOCATE = os.environ.get("DISK_PREALLOCATE", "0") == "1"  # Reserve each stream's blocks up front
+
+# Scheduling settings
+PRIORITIES = ("interactive", "normal", "bulk")  # Highest first
+INTERACTIVE_MAX_VIDEOS = 1  # Requests this small default to interactive priority; larger ones cannot use it
+CLIENT_CONCURRENCY = int(os.environ.get("CLIENT_CONCURRENCY", "0"))  # Videos in flight per client; 0 is unlimited
+QUEUE_REPORT_INTERVAL = 2.0  # Seconds between queue position updates
+
+# Shared state settings, needed when running several uvicorn workers or nodes
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "local")  # "local", "sqlite" (one host) or "redis"
+STATE_PATH = os.environ.get("STATE_PATH", "shared_state.sqlite3")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+STATE_POLL_INTERVAL = 0.1  # Seconds between polls for messages in the SQLite backend
+STATE_MESSAGE_TTL = 60  # Seconds published messages are kept in the SQLite backend
+JOB_SNAPSHOT_INTERVAL = 1.0  # Seconds between job snapshots shared with other workers
+JOB_SNAPSHOT_TTL = 86400  # Seconds finished jobs stay visible to other workers
+FINISHED_JOB_STATES = ("completed", "completed_with_errors", "cancelled")
+NODE_ID = os.urandom(8).hex()  # Identifies this process on shared channels
+
+# Post-processing settings
+POSTPROCESS_WORKERS = int(os.environ.get("POSTPROCESS_WORKERS", "2"))  # Processes merging, remuxing and tagging files
+POSTPROCESS_STEPS = ("remux", "extract_audio", "thumbnail", "metadata")  # Optional steps, run in this order
+REMUX_FORMATS = ("mp4", "mkv", "mov")
+
+# Subscription sync settings
+SYNC_PATH = os.environ.get("SYNC_PATH", "subscription_sync.sqlite3")
+SYNC_INTERVAL = float(os.environ.get("SYNC_INTERVAL", "900"))  # Default seconds between polls per user
+SYNC_MIN_INTERVAL = 60.0
+SYNC_CHECK_INTERVAL = 15.0  # Seconds between checks for due polls
+SYNC_MAX_VIDEOS = 50  # New uploads queued per poll
+
+# Startup settings
+FAST_START = os.environ.get("FAST_START", "1") != "0"  # Warm up heavy imports after the server is listening instead of before
+
+# Metrics settings
+TIMING_HEADERS = os.environ.get("TIMING_HEADERS", "0") == "1"  # Add Server-Timing headers to responses
+LOOP_MONITOR_INTERVAL = 0.5  # Seconds between event loop lag probes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+API_QUOTA_COSTS = {"search": 100}  # Quota units per call; other endpoints cost 1
+
+# Adaptive concurrency, retry and circuit breaker settings
+API_CONCURRENCY = int(os.environ.get("API_CONCURRENCY", "8"))
+ADAPT_INTERVAL = 5.0  # Seconds between concurrency adjustments
+THROTTLED_SPEED = 50 * 1024  # Bytes per second below which a transfer counts as throttled
+THROTTLED_AFTER = 10.0  # Seconds a transfer must stay below THROTTLED_SPEED
+MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 120.0
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a circuit
+BREAKER_RESET_TIMEOUT = 60.0  # Seconds before an open circuit allows a trial call
+THROTTLE_MARKERS = ("HTTP Error 429", "Too Many Requests", "rateLimitExceeded", "timed out")
+# Forbidden responses (private, geo-blocked, expired signed URLs, exhausted quota) fail the video without a retry
+FORBIDDEN_MARKERS = ("HTTP Error 403", "quotaExceeded")
+API_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")  # 403 reasons that mean throttling
+RETRYABLE_MARKERS = THROTTLE_MARKERS + (
+    "HTTP Error 5", "Connection reset", "Connection refused", "Temporary failure",
+    "IncompleteRead", "Remote end closed", "Circuit open"
+)
+
+# Bandwidth limits in bytes per second; 0 means unlimited
+BANDWIDTH_LIMIT = float(os.environ.get("BANDWIDTH_LIMIT", "0"))
+CLIENT_BANDWIDTH_LIMIT = float(os.environ.get("CLIENT_BANDWIDTH_LIMIT", "0"))
+JOB_BANDWIDTH_LIMIT = float(os.environ.get("JOB_BANDWIDTH_LIMIT", "0"))
+DEFAULT_QUALITY = "best"
+# Quality profiles: resolution cap, max total bitrate (kbps), audio only, preferred codec and container
+QUALITY_PROFILES = {
+    "best": {},
+    "1080p": {"height": 1080},
+    "720p": {"height": 720},
+    "480p": {"height": 480},
+    "data_saver": {"height": 480, "tbr": 1000, "vcodec": "avc1"},
+    "mp4_720p": {"height": 720, "vcodec": "avc1", "ext": "mp4"},
+    "audio": {"audio_only": True},
+    "audio_m4a": {"audio_only": True, "ext": "m4a"}
+}
+OVERSIZE_ACTIONS = ("skip", "downgrade")
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH", "download_archive.sqlite3")
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH", "job_journal.sqlite3")
+JOURNAL_PROGRESS_INTERVAL = 2.0  # Minimum seconds between byte offset writes per item
+JOURNAL_HEARTBEAT_INTERVAL = 10.0  # Seconds between heartbeats on the jobs a process owns
+JOURNAL_OWNER_TIMEOUT = 60.0  # Seconds without a heartbeat after which a job's owner counts as dead
+JOURNAL_OWNER = f"{socket.gethostname()}:{os.getpid()}:{NODE_ID}"  # Owner of the jobs this process runs
+JOB_RETENTION = float(os.environ.get("JOB_RETENTION", "86400"))  # Seconds finished jobs are kept before eviction
 
 # Models
 class DownloadRequest(BaseModel):
@@ -118,150 +284,3168 @@ class DownloadRequest(BaseModel):
     useRecommended: bool = False
     useWatchLater: bool = False
     useUnwatched: bool = False
+    quality: str = DEFAULT_QUALITY
+    maxBytesPerVideo: Optional[int] = None
+    maxTotalBytes: Optional[int] = None
+    oversize: str = "skip"  # "skip" or "downgrade" videos above maxBytesPerVideo
+    bandwidthLimit: Optional[float] = Field(None, ge=0)  # Bytes per second for this job, at most JOB_BANDWIDTH_LIMIT
+    priority: Optional[str] = None  # "interactive", "normal" or "bulk"; chosen from the total video count by default
+    postprocess: List[str] = []  # Steps from POSTPROCESS_STEPS; merging and checksums always run
+    remuxFormat: str = "mp4"  # Container for the "remux" step
+    # Filters applied to resolved videos before they are queued, from one videos().list call per 50 videos
+    maxDurationSeconds: Optional[int] = None
+    minDurationSeconds: Optional[int] = None
+    minViews: Optional[int] = None
+    excludeLive: bool = False  # Skip live and upcoming broadcasts
+    excludeAgeRestricted: bool = False
+
+class BandwidthLimits(BaseModel):
+    # None leaves a limit unchanged, 0 removes it; globalLimit is rejected, the server-wide cap is config only
+    globalLimit: Optional[float] = Field(None, ge=0)
+    clientLimit: Optional[float] = Field(None, ge=0)
+    jobId: Optional[str] = None
+    jobLimit: Optional[float] = Field(None, ge=0)
+
+class FolderQuota(BaseModel):
+    folder: str
+    # None falls back to FOLDER_QUOTA, 0 removes the limit
+    quotaBytes: Optional[int] = None
+
+class SyncSettings(BaseModel):
+    folder: str
+    intervalSeconds: float = SYNC_INTERVAL
+    quality: str = DEFAULT_QUALITY
+    maxBytesPerVideo: Optional[int] = None
+    backfill: int = 0  # Recent uploads queued by the first poll; later polls only queue newer ones
+    enabled: bool = True
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition model"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # label values -> [bucket counts..., sum, count]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, name: str) -> List[str]:
+        lines = []
+        for labels, series in self._series.items():
+            for index, bound in enumerate(self.buckets):
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {series[index]}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{name}_sum{format_labels(labels)} {series[-2]}")
+            lines.append(f"{name}_count{format_labels(labels)} {series[-1]}")
+        return lines
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = [
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry; counters and histograms may be updated from any thread"""
+
+    def __init__(self):
+        self._help: Dict[str, tuple] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text)
+        self._counters[name] = {}
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._histograms[name] = Histogram(buckets)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][key] = self._counters[name].get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            self._histograms[name].observe(tuple(sorted(labels.items())), value)
+
+    def render(self, gauges: List[tuple]) -> str:
+        """Render all metrics plus (name, help, {labels: value}) gauges collected at scrape time"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._help.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                if kind == "counter":
+                    lines += [f"{name}{format_labels(key)} {value}" for key, value in self._counters[name].items()]
+                else:
+                    lines += self._histograms[name].render(name)
+        for name, help_text, values in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{format_labels(key)} {value}" for key, value in values.items()]
+        return "\n".join(lines) + "\n"
+
+def create_metrics() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.histogram("ytdl_stage_duration_seconds", "Time spent per video in each pipeline stage")
+    registry.counter("ytdl_downloaded_bytes_total", "Media bytes transferred")
+    registry.histogram("ytdl_api_request_duration_seconds", "YouTube Data API call latency")
+    registry.counter("ytdl_api_quota_units_total", "YouTube Data API quota units spent")
+    registry.histogram("ytdl_websocket_fanout_lag_seconds", "Delay between a progress event and its frame reaching the client")
+    registry.counter("ytdl_websocket_frames_total", "Progress frames by outcome")
+    registry.counter("ytdl_progress_events_coalesced_total", "Intermediate progress states replaced before being sent")
+    registry.histogram("ytdl_event_loop_lag_seconds", "Event loop scheduling delay", (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+    registry.histogram("ytdl_http_request_duration_seconds", "HTTP request handling time")
+    registry.histogram("ytdl_token_refresh_duration_seconds", "OAuth token refresh latency")
+    registry.counter("ytdl_token_refreshes_total", "OAuth token refreshes by trigger and outcome")
+    registry.counter("ytdl_sync_polls_total", "Subscription sync polls by outcome")
+    registry.counter("ytdl_profile_requests_total", "User profile lookups by source")
+    return registry
+
+class LoopMonitor:
+    """Measures event loop lag as the overshoot of a periodic sleep"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.monotonic() - started - self.interval)
+            metrics.observe("ytdl_event_loop_lag_seconds", self.lag)
+
+class ProgressManager:
+    """Adapts yt-dlp progress hooks for one video to events on the progress bus"""
+
+    def __init__(self, progress_bus, client_id, video_id, job_id=None, is_cancelled=None, journal=None):
+        self.bus = progress_bus
+        self.client_id = client_id
+        self.video_id = video_id
+        self.job_id = job_id
+        self.is_cancelled = is_cancelled
+        self.journal = journal
+        self.bandwidth_share = None
+        self.limiter = None
+        self._last_bytes = 0
+        self._slow_since: Optional[float] = None
+        self._throttle_reported = False
+
+    def create_hook(self):
+        def hook(d):
+            # Raising from the hook is the only way to stop yt-dlp mid-transfer
+            if self.is_cancelled and self.is_cancelled():
+                raise yt_dlp.utils.DownloadCancelled()
+
+            status = d.get('status', '')
+            if status == 'downloading':
+                downloaded = d.get('downloaded_bytes', 0) or 0
+                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0) or 0
+                if self.journal and self.job_id:
+                    self.journal.record_progress(self.job_id, self.video_id, downloaded)
+                if self.limiter:
+                    self._track_throughput(downloaded, d.get('speed'))
+                self.bus.publish(self.client_id, {
+                    'job_id': self.job_id,
+                    'video_id': self.video_id,
+                    'status': 'downloading',
+                    'progress': (downloaded / total) * 100 if total > 0 else 0,
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'speed': d.get('speed') or 0,
+                    'eta': d.get('eta') or 0,
+                    'rate_limit': self.bandwidth_share.rate if self.bandwidth_share else 0
+                })
+            
+            elif status == 'finished':
+                size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                self.bus.publish(self.client_id, {
+                    'job_id': self.job_id,
+                    'video_id': self.video_id,
+                    'status': 'finished',
+                    'progress': 100,
+                    'downloaded_bytes': size,
+                    'total_bytes': size
+                })
+        
+        return hook
+
+    def _track_throughput(self, downloaded: int, speed: Optional[float]):
+        # Counters restart for each stream of a merged format
+        delta = downloaded - self._last_bytes if downloaded >= self._last_bytes else downloaded
+        self._last_bytes = downloaded
+        self.limiter.record_units(delta)
+        metrics.inc("ytdl_downloaded_bytes_total", delta)
+
+        # A transfer held below THROTTLED_SPEED by us is not being throttled by YouTube
+        rate_limit = self.bandwidth_share.rate if self.bandwidth_share else 0
+        if speed is None or speed >= THROTTLED_SPEED or (rate_limit and rate_limit < THROTTLED_SPEED):
+            self._slow_since = None
+            return
+        now = time.monotonic()
+        if self._slow_since is None:
+            self._slow_since = now
+        elif now - self._slow_since > THROTTLED_AFTER and not self._throttle_reported:
+            logger.warning(f"Transfer of {self.video_id} appears throttled at {speed:.0f} B/s")
+            self._throttle_reported = True
+            self.limiter.record_throttle()
+
+class WebSocketManager:
+    def __init__(self):
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self._lock = asyncio.Lock()
+
+    async def connect(self, websocket: WebSocket, client_id: str):
+        await websocket.accept()
+        async with self._lock:
+            if client_id not in self.active_connections:
+                self.active_connections[client_id] = []
+            self.active_connections[client_id].append(websocket)
+        logger.info(f"New WebSocket connection established for client {client_id}")
+
+    async def disconnect(self, websocket: WebSocket, client_id: str):
+        async with self._lock:
+            if client_id in self.active_connections:
+                try:
+                    self.active_connections[client_id].remove(websocket)
+                    if not self.active_connections[client_id]:
+                        del self.active_connections[client_id]
+                except ValueError:
+                    pass
+        logger.info(f"WebSocket connection closed for client {client_id}")
+
+    async def broadcast_to_client(self, client_id: str, message: str) -> int:
+        """Send a message to all of a client's connections; returns how many received it"""
+        if client_id not in self.active_connections:
+            return 0
+        
+        disconnected = []
+        for connection in self.active_connections[client_id]:
+            try:
+                await connection.send_text(message)
+            except Exception as e:
+                logger.error(f"Error broadcasting to client {client_id}: {e}")
+                disconnected.append(connection)
+        
+        for conn in disconnected:
+            await self.disconnect(conn, client_id)
+        return len(self.active_connections.get(client_id, []))
+
+class ProgressBus:
+    """Coalesces progress events from any thread into one frame per client per interval"""
+
+    def __init__(self, websocket_manager, interval: float):
+        self.manager = websocket_manager
+        self.interval = interval
+        # client_id -> (job_id, video_id) -> latest event; newer events replace older ones
+        self._pending: Dict[str, Dict[tuple, dict]] = {}
+        # job_id -> video_id -> byte counters used for job-level aggregates
+        self._job_bytes: Dict[str, Dict[str, dict]] = {}
+        # job_id -> (videos queued so far, job status), as reported by the job manager
+        self._jobs: Dict[str, tuple] = {}
+        # Jobs whose counters are dropped once their last frame has been built
+        self._finished_jobs: set = set()
+        self._lock = threading.Lock()
+        self._sending: Dict[str, asyncio.Task] = {}
+        # client_id -> when the oldest unsent event was published
+        self._oldest: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, client_id: str, event: dict):
+        """Record an event; safe to call from executor threads"""
+        key = (event.get('job_id'), event.get('video_id') or event.get('source') or event.get('status'))
+        with self._lock:
+            pending = self._pending.setdefault(client_id, {})
+            if key in pending:
+                metrics.inc("ytdl_progress_events_coalesced_total")
+            pending[key] = event
+            self._oldest.setdefault(client_id, time.monotonic())
+            if event.get('job_id') and event.get('video_id') and 'downloaded_bytes' in event:
+                counters = self._item_counters(event['job_id'], event['video_id'])
+                downloaded = event.get('downloaded_bytes', 0)
+                if downloaded < counters['downloaded']:
+                    # The next stream of a merged format restarts the transfer counters
+                    counters['base'] += counters['downloaded']
+                counters['downloaded'] = downloaded
+                counters['total'] = event.get('total_bytes', 0)
+                counters['speed'] = event.get('speed', 0) if event.get('status') == 'downloading' else 0
+
+    def _item_counters(self, job_id: str, video_id: str) -> dict:
+        return self._job_bytes.setdefault(job_id, {}).setdefault(video_id, {
+            'base': 0, 'downloaded': 0, 'total': 0, 'speed': 0, 'expected': 0, 'settled': False
+        })
+
+    def expect(self, job_id: str, video_id: str, expected_bytes: Optional[int]):
+        """Record a video's size from the metadata stage, before its transfer reports any bytes"""
+        with self._lock:
+            self._item_counters(job_id, video_id)['expected'] = expected_bytes or 0
+
+    def settle(self, job_id: str, video_id: str):
+        """Count a video as done for its job, whether it finished, failed, was skipped or cancelled"""
+        with self._lock:
+            counters = self._item_counters(job_id, video_id)
+            counters['settled'] = True
+            counters['speed'] = 0
+
+    def track_job(self, job_id: str, videos: int, status: str):
+        with self._lock:
+            self._jobs[job_id] = (videos, status)
+
+    async def _send(self, client_id: str, frame: dict, oldest: float):
+        message = json.dumps(frame)
+        delivered = await self.manager.broadcast_to_client(client_id, message)
+        if state_backend.shared:
+            # The client may also be connected to another worker
+            try:
+                await state_backend.publish("progress", {"origin": NODE_ID, "client_id": client_id, "frame": message})
+            except Exception as e:
+                logger.error(f"Failed to publish progress for client {client_id}: {e}")
+        if delivered:
+            metrics.inc("ytdl_websocket_frames_total", outcome="sent")
+            metrics.observe("ytdl_websocket_fanout_lag_seconds", time.monotonic() - oldest)
+        else:
+            metrics.inc("ytdl_websocket_frames_total", outcome="forwarded" if state_backend.shared else "dropped")
+
+    def finish_job(self, job_id: str):
+        """Forget a finished job's counters after its final frame"""
+        with self._lock:
+            self._finished_jobs.add(job_id)
+
+    def job_speeds(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                job_id: sum(item['speed'] for item in items.values())
+                for job_id, items in self._job_bytes.items()
+            }
+
+    def _job_summary(self, job_id: str) -> dict:
+        items = self._job_bytes.get(job_id, {}).values()
+        videos, status = self._jobs.get(job_id, (0, None))
+        videos = max(videos, len(items))
+        downloaded = total = remaining = 0
+        done = 0.0
+        for item in items:
+            received = item['base'] + item['downloaded']
+            downloaded += received
+            if item['settled']:
+                done += 1
+                total += received
+                continue
+            # The metadata stage's size covers every stream; transfer totals only the current one
+            size = item['expected'] or item['base'] + item['total']
+            total += size
+            if size:
+                done += min(received / size, 1)
+                remaining += max(size - received, 0)
+        speed = sum(item['speed'] for item in items)
+        # Videos not extracted yet count as not started, so progress only reaches 100 once all are settled
+        return {
+            'job_id': job_id,
+            'status': status,
+            'videos': videos,
+            'settled_videos': sum(1 for item in items if item['settled']),
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'progress': (done / videos) * 100 if videos else 0,
+            'speed': speed,
+            'eta': remaining / speed if speed > 0 else None
+        }
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Progress bus flush error: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            frames = {}
+            for client_id, events in pending.items():
+                sending = self._sending.get(client_id)
+                if sending and not sending.done():
+                    # Client is still receiving the previous frame: keep only the latest states
+                    events.update(self._pending.get(client_id, {}))
+                    self._pending[client_id] = events
+                    metrics.inc("ytdl_websocket_frames_total", outcome="deferred")
+                    continue
+                job_ids = {job_id for job_id, _ in events if job_id}
+                job_events = [event for event in events.values() if not event.get('video_id')]
+                frames[client_id] = {
+                    'type': 'progress',
+                    'items': [event for event in events.values() if event.get('video_id')],
+                    'jobs': [self._job_summary(job_id) for job_id in job_ids],
+                    'errors': [event for event in job_events if event.get('status') == 'error'],
+                    'queue': [event for event in job_events if event.get('status') == 'queued']
+                }
+            # Keep counters of finished jobs until no deferred frame still needs them
+            waiting = {job_id for events in self._pending.values() for job_id, _ in events}
+            for job_id in self._finished_jobs - waiting:
+                self._job_bytes.pop(job_id, None)
+                self._jobs.pop(job_id, None)
+            self._finished_jobs &= waiting
+
+        for client_id, frame in frames.items():
+            with self._lock:
+                oldest = self._oldest.pop(client_id, time.monotonic())
+            self._sending[client_id] = asyncio.create_task(self._send(client_id, frame, oldest))
+        for client_id in [c for c, task in self._sending.items() if task.done() and c not in frames]:
+            del self._sending[client_id]
+
+class LocalStateBackend:
+    """State kept in this process only; the default for a single worker"""
+
+    shared = False
+
+    async def start(self, on_message):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get_credentials(self, client_id: str) -> Optional[str]:
+        return None
+
+    async def put_credentials(self, client_id: str, data: str):
+        pass
+
+    async def delete_credentials(self, client_id: str):
+        pass
+
+    async def list_credentials(self) -> List[tuple]:
+        return []
+
+    async def put_job(self, job_id: str, client_id: str, snapshot: dict, finished: bool):
+        pass
+
+    async def get_job(self, job_id: str) -> Optional[tuple]:
+        """Return (client_id, snapshot) for a job shared by any worker"""
+        return None
+
+    async def list_jobs(self, client_id: str) -> List[dict]:
+        return []
+
+    async def publish(self, channel: str, message: dict):
+        pass
+
+class SqliteStateBackend(LocalStateBackend):
+    """State shared between worker processes on one host through a SQLite file"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state")
+        self._task: Optional[asyncio.Task] = None
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS credentials (client_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    client_id TEXT NOT NULL,
+                    snapshot TEXT NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client_id)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._last_message = self._conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: tuple = ()) -> list:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._execute, sql, params)
+
+    async def start(self, on_message):
+        self._task = asyncio.create_task(self._poll(on_message))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+    async def _poll(self, on_message):
+        last_cleanup = time.monotonic()
+        while True:
+            await asyncio.sleep(STATE_POLL_INTERVAL)
+            try:
+                rows = await self._run(
+                    "SELECT id, channel, payload FROM messages WHERE id > ? ORDER BY id", (self._last_message,)
+                )
+                for message_id, channel, payload in rows:
+                    self._last_message = message_id
+                    on_message(channel, json.loads(payload))
+                if time.monotonic() - last_cleanup > STATE_MESSAGE_TTL:
+                    last_cleanup = time.monotonic()
+                    await self._run("DELETE FROM messages WHERE created_at < ?", (time.time() - STATE_MESSAGE_TTL,))
+                    await self._run("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+            except Exception as e:
+                logger.error(f"Shared state poll error: {e}")
+
+    async def get_credentials(self, client_id: str) -> Optional[str]:
+        rows = await self._run("SELECT data FROM credentials WHERE client_id = ?", (client_id,))
+        return rows[0][0] if rows else None
+
+    async def put_credentials(self, client_id: str, data: str):
+        await self._run(
+            "INSERT INTO credentials (client_id, data) VALUES (?, ?) "
+            "ON CONFLICT(client_id) DO UPDATE SET data = excluded.data",
+            (client_id, data)
+        )
+
+    async def delete_credentials(self, client_id: str):
+        await self._run("DELETE FROM credentials WHERE client_id = ?", (client_id,))
+
+    async def list_credentials(self) -> List[tuple]:
+        return await self._run("SELECT client_id, data FROM credentials")
+
+    async def put_job(self, job_id: str, client_id: str, snapshot: dict, finished: bool):
+        await self._run(
+            "INSERT INTO jobs (job_id, client_id, snapshot, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET snapshot = excluded.snapshot, expires_at = excluded.expires_at",
+            (job_id, client_id, json.dumps(snapshot), time.time() + JOB_SNAPSHOT_TTL if finished else None)
+        )
+
+    async def get_job(self, job_id: str) -> Optional[tuple]:
+        rows = await self._run("SELECT client_id, snapshot FROM jobs WHERE job_id = ?", (job_id,))
+        return (rows[0][0], json.loads(rows[0][1])) if rows else None
+
+    async def list_jobs(self, client_id: str) -> List[dict]:
+        rows = await self._run("SELECT snapshot FROM jobs WHERE client_id = ?", (client_id,))
+        return [json.loads(row[0]) for row in rows]
+
+    async def publish(self, channel: str, message: dict):
+        await self._run(
+            "INSERT INTO messages (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(message), time.time())
+        )
+
+class RedisStateBackend(LocalStateBackend):
+    """State shared between workers and nodes through a Redis-compatible server"""
+
+    shared = True
+    CHANNELS = ("progress", "control")
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND=redis requires the redis package (pip install redis)")
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message):
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(*(f"ytdl:{channel}" for channel in self.CHANNELS))
+        self._task = asyncio.create_task(self._listen(on_message))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._pubsub:
+            await self._pubsub.close()
+        await self._redis.close()
+
+    async def _listen(self, on_message):
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                on_message(message["channel"].split(":", 1)[1], json.loads(message["data"]))
+            except Exception as e:
+                logger.error(f"Shared state message error: {e}")
+
+    async def get_credentials(self, client_id: str) -> Optional[str]:
+        return await self._redis.hget("ytdl:credentials", client_id)
+
+    async def put_credentials(self, client_id: str, data: str):
+        await self._redis.hset("ytdl:credentials", client_id, data)
+
+    async def delete_credentials(self, client_id: str):
+        await self._redis.hdel("ytdl:credentials", client_id)
+
+    async def list_credentials(self) -> List[tuple]:
+        return list((await self._redis.hgetall("ytdl:credentials")).items())
+
+    async def put_job(self, job_id: str, client_id: str, snapshot: dict, finished: bool):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(
+                f"ytdl:job:{job_id}",
+                json.dumps({"client_id": client_id, "snapshot": snapshot}),
+                ex=JOB_SNAPSHOT_TTL if finished else None
+            )
+            pipe.sadd(f"ytdl:client-jobs:{client_id}", job_id)
+            pipe.expire(f"ytdl:client-jobs:{client_id}", JOB_SNAPSHOT_TTL)
+            await pipe.execute()
+
+    async def get_job(self, job_id: str) -> Optional[tuple]:
+        data = await self._redis.get(f"ytdl:job:{job_id}")
+        if not data:
+            return None
+        record = json.loads(data)
+        return record["client_id"], record["snapshot"]
+
+    async def list_jobs(self, client_id: str) -> List[dict]:
+        job_ids = list(await self._redis.smembers(f"ytdl:client-jobs:{client_id}"))
+        if not job_ids:
+            return []
+        records = await self._redis.mget([f"ytdl:job:{job_id}" for job_id in job_ids])
+        return [json.loads(record)["snapshot"] for record in records if record]
+
+    async def publish(self, channel: str, message: dict):
+        await self._redis.publish(f"ytdl:{channel}", json.dumps(message))
+
+def create_state_backend(name: str) -> LocalStateBackend:
+    if name == "sqlite":
+        return SqliteStateBackend(STATE_PATH)
+    if name == "redis":
+        return RedisStateBackend(REDIS_URL)
+    if name != "local":
+        logger.warning(f"Unknown STATE_BACKEND {name}, keeping state in process")
+    return LocalStateBackend()
+
+class CredentialManager:
+    def __init__(self, backend: LocalStateBackend):
+        self.backend = backend
+        self.credentials: Dict[str, Credentials] = {}
+        # client_id -> serialized form of the cached credentials, when they are shared
+        self._serialized: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    def _load(self, client_id: str, data: str) -> Credentials:
+        # Reuse the cached object while it is unchanged instead of parsing it on every request
+        if self._serialized.get(client_id) != data:
+            self.credentials[client_id] = Credentials.from_authorized_user_info(json.loads(data))
+            self._serialized[client_id] = data
+        return self.credentials[client_id]
+
+    async def store(self, client_id: str, credentials: Credentials):
+        async with self._lock:
+            self.credentials[client_id] = credentials
+            if self.backend.shared:
+                self._serialized[client_id] = credentials.to_json()
+        if self.backend.shared:
+            await self.backend.put_credentials(client_id, self._serialized[client_id])
+
+    async def get(self, client_id: str) -> Optional[Credentials]:
+        if self.backend.shared:
+            data = await self.backend.get_credentials(client_id)
+            async with self._lock:
+                if data is None:
+                    self.credentials.pop(client_id, None)
+                    self._serialized.pop(client_id, None)
+                    return None
+                return self._load(client_id, data)
+        async with self._lock:
+            return self.credentials.get(client_id)
+
+    async def remove(self, client_id: str):
+        async with self._lock:
+            self.credentials.pop(client_id, None)
+            self._serialized.pop(client_id, None)
+        if self.backend.shared:
+            await self.backend.delete_credentials(client_id)
+
+    async def items(self) -> List[tuple]:
+        if self.backend.shared:
+            shared = await self.backend.list_credentials()
+            async with self._lock:
+                return [(client_id, self._load(client_id, data)) for client_id, data in shared]
+        async with self._lock:
+            return list(self.credentials.items())
+
+class ApiResponseCache:
+    """Bounded LRU cache of YouTube API responses with per-endpoint TTLs and ETag revalidation"""
+
+    def __init__(self, max_entries: int, ttls: Dict[str, float], default_ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        # (endpoint, scope, *params) -> (stored_at, response)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def get(self, key: tuple):
+        """Return (response, is_fresh), or None when the key is not cached"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        stored_at, response = entry
+        ttl = self.ttls.get(key[0], self.default_ttl)
+        return response, time.monotonic() - stored_at < ttl
+
+    def put(self, key: tuple, response: dict):
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_scope(self, scope: str):
+        for key in [key for key in self._entries if key[1] == scope]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class YouTubeApiError(Exception):
+    """Error response from the YouTube Data API"""
+
+    def __init__(self, status: int, reason: str = "", message: str = ""):
+        super().__init__(f"YouTube API error {status} {reason}: {message}".strip())
+        self.status = status
+        self.reason = reason
+
+class YouTubeApiClient:
+    """Async Data API client on one pooled aiohttp session, with daily quota accounting"""
+
+    def __init__(self, base_url: str, connection_limit: int, daily_quota: int):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.connection_limit = connection_limit
+        self.daily_quota = daily_quota
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._quota_day = None
+        # endpoint -> quota units spent today
+        self.quota_used: Dict[str, int] = {}
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            ),
+            timeout=aiohttp.ClientTimeout(total=API_TIMEOUT)
+        )
+
+    async def stop(self):
+        if self._session:
+            await self._session.close()
+
+    def _charge(self, endpoint: str):
+        day = datetime.now(QUOTA_TIMEZONE).date()
+        if day != self._quota_day:
+            self._quota_day = day
+            self.quota_used = {}
+        cost = API_QUOTA_COSTS.get(endpoint, 1)
+        warn_at = self.daily_quota * 0.9
+        before = sum(self.quota_used.values())
+        self.quota_used[endpoint] = self.quota_used.get(endpoint, 0) + cost
+        metrics.inc("ytdl_api_quota_units_total", cost, endpoint=endpoint)
+        if before < warn_at <= before + cost:
+            logger.warning(f"YouTube API quota at {before + cost} of {self.daily_quota} units for today")
+
+    def quota(self) -> dict:
+        used = sum(self.quota_used.values())
+        return {
+            "day": self._quota_day.isoformat() if self._quota_day else None,
+            "used": used,
+            "limit": self.daily_quota,
+            "remaining": max(0, self.daily_quota - used),
+            "by_endpoint": dict(self.quota_used)
+        }
+
+    async def get(self, endpoint: str, params: dict, credentials: Credentials, etag: Optional[str] = None) -> Optional[dict]:
+        """Call a list endpoint; returns None when the response still matches etag"""
+        headers = {"Authorization": f"Bearer {credentials.token}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        query = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in params.items() if value is not None
+        }
+        self._charge(endpoint)
+        async with self._session.get(self.base_url + endpoint, params=query, headers=headers) as response:
+            if response.status == 304:
+                return None
+            if response.status >= 400:
+                # Error bodies from proxies and load balancers are often HTML, not JSON
+                text = await response.text(errors="replace")
+                try:
+                    body = json.loads(text)
+                except ValueError:
+                    body = None
+                if isinstance(body, dict) and isinstance(body.get("error"), dict):
+                    error = body["error"]
+                    reason = ((error.get("errors") or [{}])[0] or {}).get("reason", "")
+                    raise YouTubeApiError(response.status, reason, error.get("message", ""))
+                raise YouTubeApiError(response.status, response.reason or "", text[:200])
+            return await response.json(content_type=None)
+
+class GoogleCertCache:
+    """Google's id_token signing certs, kept for as long as the certs response allows"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._certs: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._fetching: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=API_TIMEOUT))
+
+    async def stop(self):
+        if self._session:
+            await self._session.close()
+
+    async def get(self) -> Dict[str, str]:
+        if self._certs is not None and time.monotonic() < self._expires_at:
+            return self._certs
+        # Concurrent callers share one fetch
+        if not self._fetching or self._fetching.done():
+            self._fetching = asyncio.create_task(self._fetch())
+        return await asyncio.shield(self._fetching)
+
+    async def _fetch(self) -> Dict[str, str]:
+        async with self._session.get(self.url) as response:
+            response.raise_for_status()
+            certs = await response.json(content_type=None)
+            ttl = self._ttl(response.headers)
+        self._certs = certs
+        self._expires_at = time.monotonic() + ttl
+        logger.debug(f"Fetched Google signing certs, cached for {ttl:.0f}s")
+        return certs
+
+    @staticmethod
+    def _ttl(headers) -> float:
+        """Freshness lifetime from Cache-Control max-age minus Age, falling back to Expires"""
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control or "no-cache" in cache_control:
+            return 0.0
+        match = re.search(r"max-age=(\d+)", cache_control)
+        if match:
+            return max(0.0, int(match.group(1)) - float(headers.get("Age", 0) or 0))
+        expires = headers.get("Expires")
+        if expires:
+            try:
+                return max(0.0, (email.utils.parsedate_to_datetime(expires) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                return 0.0
+        return CERT_CACHE_DEFAULT_TTL
+
+    async def verify(self, token: str, audience: str) -> dict:
+        """Verify an id_token signature, audience and issuer; mirrors verify_oauth2_token"""
+        id_info = google_jwt.decode(token, certs=await self.get(), audience=audience)
+        if id_info.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {id_info.get('iss')}")
+        return id_info
+
+class ProfileCache:
+    """Resolved user profiles per client, dropped on re-auth and logout"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # client_id -> (profile, expires_at)
+        self._profiles: Dict[str, tuple] = {}
+
+    def get(self, client_id: str) -> Optional[dict]:
+        entry = self._profiles.get(client_id)
+        if entry and time.monotonic() < entry[1]:
+            return entry[0]
+        return None
+
+    def put(self, client_id: str, profile: dict):
+        self._profiles[client_id] = (profile, time.monotonic() + self.ttl)
+
+    def invalidate(self, client_id: str):
+        self._profiles.pop(client_id, None)
+
+class AuthManager:
+    def __init__(self, state_backend: LocalStateBackend):
+        self.credential_manager = CredentialManager(state_backend)
+        # client_id -> in-flight refresh, shared by every caller waiting on that client
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._executor = ThreadPoolExecutor(max_workers=TOKEN_REFRESH_WORKERS, thread_name_prefix="token-refresh")
+        self._transport = threading.local()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._renew_expiring())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _refresh_blocking(self, creds: Credentials):
+        # One transport per thread so connections to the token endpoint are reused
+        if not hasattr(self._transport, "request"):
+            from google.auth.transport.requests import Request as GoogleRequest
+            self._transport.request = GoogleRequest()
+        creds.refresh(self._transport.request)
+
+    async def _do_refresh(self, client_id: str, creds: Credentials, trigger: str) -> bool:
+        started = time.monotonic()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._refresh_blocking, creds)
+        except RefreshError as e:
+            # The grant was revoked or expired: the user has to sign in again
+            logger.error(f"Failed to refresh credentials for client_id {client_id}: {e}")
+            metrics.inc("ytdl_token_refreshes_total", trigger=trigger, outcome="revoked")
+            await self.credential_manager.remove(client_id)
+            profile_cache.invalidate(client_id)
+            return False
+        except Exception as e:
+            logger.error(f"Error refreshing credentials for client_id {client_id}: {e}")
+            metrics.inc("ytdl_token_refreshes_total", trigger=trigger, outcome="failed")
+            return False
+        finally:
+            metrics.observe("ytdl_token_refresh_duration_seconds", time.monotonic() - started, trigger=trigger)
+
+        metrics.inc("ytdl_token_refreshes_total", trigger=trigger, outcome="success")
+        await self.credential_manager.store(client_id, creds)
+        logger.debug(f"Successfully refreshed credentials for client_id: {client_id}")
+        return True
+
+    def refresh(self, client_id: str, creds: Credentials, trigger: str = "on_demand") -> asyncio.Task:
+        """Start a refresh off the event loop, or join the one already running for this client"""
+        task = self._refreshing.get(client_id)
+        if task is None:
+            task = asyncio.create_task(self._do_refresh(client_id, creds, trigger))
+            self._refreshing[client_id] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(client_id, None))
+        return task
+
+    async def _renew_expiring(self):
+        """Renew tokens shortly before they expire so request paths never wait on a refresh"""
+        while True:
+            await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
+            deadline = datetime.utcnow() + timedelta(seconds=TOKEN_REFRESH_MARGIN)
+            for client_id, creds in await self.credential_manager.items():
+                if creds.refresh_token and creds.expiry and creds.expiry <= deadline:
+                    self.refresh(client_id, creds, trigger="proactive")
+
+    async def get_valid_credentials(self, client_id: str) -> Optional[Credentials]:
+        try:
+            creds = await self.credential_manager.get(client_id)
+            if not creds:
+                logger.debug(f"No credentials found for client_id: {client_id}")
+                return None
+
+            # Normally renewed in the background; refresh on demand if that fell behind
+            if not creds.valid:
+                logger.debug(f"Credentials invalid for client_id: {client_id}, attempting refresh")
+                if not (creds.expired and creds.refresh_token):
+                    return None
+                # Shielded so a disconnecting caller does not cancel a refresh others are waiting on
+                if not await asyncio.shield(self.refresh(client_id, creds)):
+                    return None
+
+            return creds
+        except Exception as e:
+            logger.error(f"Error in get_valid_credentials: {e}")
+            return None
+
+def profile_format(name: str, max_bytes: Optional[int] = None, merge: bool = True) -> str:
+    """Build a yt-dlp format selector for a quality profile, optionally capped at max_bytes
+
+    Without merge (no ffmpeg to combine separate streams) only single-file formats are selected.
+    """
+    profile = QUALITY_PROFILES[name]
+    if not profile and not max_bytes:
+        return "best"
+
+    caps = ""
+    if profile.get("height"):
+        caps += f"[height<={profile['height']}]"
+    if profile.get("tbr"):
+        caps += f"[tbr<={profile['tbr']}]"
+
+    # Split a byte cap between the merged streams; unknown sizes pass the filter
+    video_size = audio_size = single_size = ""
+    if max_bytes:
+        video_size = f"[filesize<?{int(max_bytes * 0.85)}]"
+        audio_size = f"[filesize<?{int(max_bytes * 0.15)}]"
+        single_size = f"[filesize<?{max_bytes}]"
+
+    preferred = ""
+    if profile.get("vcodec"):
+        preferred += f"[vcodec^={profile['vcodec']}]"
+    if profile.get("ext"):
+        preferred += f"[ext={profile['ext']}]"
+
+    if profile.get("audio_only"):
+        selectors = [f"ba{preferred}{single_size}", f"ba{single_size}"]
+    elif not merge:
+        selectors = [f"b{caps}{preferred}{single_size}"] if preferred else []
+        selectors += [f"b{caps}{single_size}"]
+    else:
+        audio_preferred = "[ext=m4a]" if profile.get("ext") == "mp4" else ""
+        selectors = [f"bv*{caps}{preferred}{video_size}+ba{audio_preferred}{audio_size}"] if preferred else []
+        selectors += [f"bv*{caps}{video_size}+ba{audio_size}", f"b{caps}{single_size}"]
+    return "/".join(dict.fromkeys(selectors))
+
+def parse_video_id(url: str) -> Optional[str]:
+    """Extract the YouTube video ID from a watch URL"""
+    parsed = urlparse(url)
+    if parsed.hostname == "youtu.be":
+        return parsed.path.lstrip("/") or None
+    return parse_qs(parsed.query).get("v", [None])[0]
+
+def parse_duration(value: str) -> Optional[int]:
+    """Seconds in an ISO 8601 duration such as PT1H2M3S"""
+    match = re.fullmatch(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?", value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def filter_reason(video: Optional[dict], filters: dict) -> Optional[str]:
+    """Why a videos().list resource fails a job's filters, or None if it passes"""
+    if video is None:
+        return "unavailable"
+    if filters.get("exclude_live"):
+        broadcast = video.get("snippet", {}).get("liveBroadcastContent", "none")
+        if broadcast in ("live", "upcoming"):
+            return broadcast
+    content = video.get("contentDetails", {})
+    if filters.get("exclude_age_restricted") and content.get("contentRating", {}).get("ytRating") == "ytAgeRestricted":
+        return "age_restricted"
+    duration = parse_duration(content.get("duration"))
+    if duration is not None:
+        if filters.get("max_duration") and duration > filters["max_duration"]:
+            return "too_long"
+        if filters.get("min_duration") and duration < filters["min_duration"]:
+            return "too_short"
+    views = video.get("statistics", {}).get("viewCount")
+    # Hidden view counts pass
+    if filters.get("min_views") and views is not None and int(views) < filters["min_views"]:
+        return "too_few_views"
+    return None
+
+class DownloadArchive:
+    """Persistent index of completed downloads keyed by video ID, folder and format"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Written from download executor threads, read from the event loop
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive (
+                    video_id TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    filepath TEXT,
+                    size INTEGER,
+                    checksum TEXT,
+                    downloaded_at TEXT NOT NULL,
+                    client_id TEXT,
+                    PRIMARY KEY (video_id, folder, format)
+                )
+            """)
+            try:
+                self._conn.execute("ALTER TABLE archive ADD COLUMN client_id TEXT")
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+
+    def contains(self, video_id: str, folder: str, quality: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM archive WHERE video_id = ? AND folder = ? AND format = ?",
+                (video_id, os.path.abspath(folder), quality)
+            ).fetchone()
+        return row is not None
+
+    def record(
+        self,
+        client_id: str,
+        video_id: str,
+        folder: str,
+        quality: str,
+        filepath: str,
+        checksum: Optional[str] = None
+    ):
+        size = os.path.getsize(filepath)
+        checksum = checksum or file_checksum(filepath)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO archive
+                    (video_id, folder, format, filepath, size, checksum, downloaded_at, client_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    video_id,
+                    os.path.abspath(folder),
+                    quality,
+                    filepath,
+                    size,
+                    checksum,
+                    datetime.now().isoformat(),
+                    client_id
+                )
+            )
+
+    def query(
+        self,
+        client_id: str,
+        folder: Optional[str] = None,
+        video_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """Entries downloaded by one client; skipping in contains() still applies across clients"""
+        sql = "SELECT * FROM archive WHERE client_id = ?"
+        params = [client_id]
+        if folder:
+            sql += " AND folder = ?"
+            params.append(os.path.abspath(folder))
+        if video_id:
+            sql += " AND video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY downloaded_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(
+        self,
+        client_id: str,
+        folder: Optional[str] = None,
+        video_id: Optional[str] = None,
+        older_than: Optional[datetime] = None,
+        missing_only: bool = False
+    ) -> int:
+        """Remove a client's matching entries; with missing_only, only those whose file is gone"""
+        rows = self.query(client_id, folder, video_id, limit=-1)
+        if older_than:
+            rows = [row for row in rows if row["downloaded_at"] < older_than.isoformat()]
+        if missing_only:
+            rows = [row for row in rows if not row["filepath"] or not os.path.exists(row["filepath"])]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM archive WHERE video_id = ? AND folder = ? AND format = ?",
+                [(row["video_id"], row["folder"], row["format"]) for row in rows]
+            )
+        return len(rows)
+
+class JobJournal:
+    """Durable record of jobs and item states used to resume work after a restart"""
+
+    UNFINISHED_STATES = ACTIVE_ITEM_STATES
+
+    def __init__(self, path: str, progress_interval: float, owner: str, owner_timeout: float):
+        self.path = path
+        self.progress_interval = progress_interval
+        self.owner = owner
+        self.owner_timeout = owner_timeout
+        # Shared by every worker process, so wait for their writes instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._progress_written: Dict[tuple, float] = {}
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    client_id TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    resolving INTEGER NOT NULL,
+                    cancelled INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    options TEXT
+                )
+            """)
+            for column in ("options TEXT", "owner TEXT", "heartbeat REAL"):
+                try:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass  # Column already exists
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    job_id TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (job_id, item_id)
+                )
+            """)
+
+    def record_job(self, job: "DownloadJob"):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (job_id, client_id, folder, format, resolving, cancelled, created_at, options, owner, heartbeat)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.job_id,
+                    job.client_id,
+                    job.folder,
+                    job.quality,
+                    int(job.resolving),
+                    int(job.cancelled),
+                    job.created_at.isoformat(),
+                    json.dumps({
+                        "max_bytes_per_video": job.max_bytes_per_video,
+                        "max_total_bytes": job.max_total_bytes,
+                        "oversize": job.oversize,
+                        "priority": job.priority,
+                        "postprocess": job.postprocess,
+                        "remux_format": job.remux_format,
+                        "filters": job.filters
+                    }),
+                    self.owner,
+                    time.time()
+                )
+            )
+
+    def record_item(self, item: "DownloadItem"):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO items (job_id, item_id, url, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id, item_id) DO UPDATE SET
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (item.job_id, item.item_id, item.url, item.status, item.error, datetime.now().isoformat())
+            )
+        if item.status not in self.UNFINISHED_STATES:
+            self._progress_written.pop((item.job_id, item.item_id), None)
+
+    def record_progress(self, job_id: str, item_id: str, downloaded_bytes: int):
+        """Record the byte offset of a transfer; throttled, safe to call from executor threads"""
+        key = (job_id, item_id)
+        now = time.monotonic()
+        if now - self._progress_written.get(key, 0) < self.progress_interval:
+            return
+        self._progress_written[key] = now
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET downloaded_bytes = ?, updated_at = ? WHERE job_id = ? AND item_id = ?",
+                (downloaded_bytes, datetime.now().isoformat(), job_id, item_id)
+            )
+
+    def claim_restore(self) -> bool:
+        """Whether this process resumes unfinished jobs; only one of the processes sharing the journal does"""
+        if fcntl is None:
+            return True
+        # The lock is released by the OS when the holder exits, so a restarted worker can take over
+        self._restore_lock = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(self._restore_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._restore_lock.close()
+            return False
+        return True
+
+    def heartbeat(self):
+        """Mark this process's jobs as still running"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ?", (time.time(), self.owner))
+
+    def _owner_dead(self, owner: Optional[str], heartbeat: Optional[float]) -> bool:
+        if not owner or heartbeat is None:
+            return True
+        if owner == self.owner:
+            return False
+        host, _, rest = owner.partition(":")
+        pid = rest.partition(":")[0]
+        if host == socket.gethostname() and pid.isdigit():
+            # A process on this host can be checked directly instead of waiting for the timeout
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True
+            except OSError:
+                pass  # Exists but belongs to another user
+        return time.time() - heartbeat > self.owner_timeout
+
+    def prune(self, older_than: datetime) -> int:
+        """Delete jobs, with their items, that have nothing left to run and no activity since older_than"""
+        cutoff = older_than.isoformat()
+        placeholders = ", ".join("?" * len(self.UNFINISHED_STATES))
+        with self._lock, self._conn:
+            job_ids = [
+                (row[0],) for row in self._conn.execute(
+                    f"""
+                    SELECT job_id FROM jobs WHERE created_at < ? AND job_id NOT IN (
+                        SELECT job_id FROM items WHERE status IN ({placeholders}) OR updated_at >= ?
+                    )
+                    """,
+                    (cutoff, *self.UNFINISHED_STATES, cutoff)
+                )
+            ]
+            self._conn.executemany("DELETE FROM items WHERE job_id = ?", job_ids)
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", job_ids)
+        return len(job_ids)
+
+    def load_unfinished(self) -> List[tuple]:
+        """Take over and return (job row, item rows) of every job with queued or in-flight items whose owner is dead"""
+        placeholders = ", ".join("?" * len(self.UNFINISHED_STATES))
+        with self._lock:
+            jobs = self._conn.execute(
+                f"""
+                SELECT * FROM jobs WHERE job_id IN (
+                    SELECT job_id FROM items WHERE status IN ({placeholders})
+                ) ORDER BY created_at
+                """,
+                self.UNFINISHED_STATES
+            ).fetchall()
+            result = []
+            for job in jobs:
+                if not self._owner_dead(job["owner"], job["heartbeat"]):
+                    continue
+                with self._conn:
+                    # Conditional on the owner seen above, so a job is never taken over twice
+                    claimed = self._conn.execute(
+                        "UPDATE jobs SET owner = ?, heartbeat = ? WHERE job_id = ? AND owner IS ?",
+                        (self.owner, time.time(), job["job_id"], job["owner"])
+                    ).rowcount
+                if not claimed:
+                    continue
+                items = self._conn.execute(
+                    "SELECT * FROM items WHERE job_id = ? ORDER BY rowid",
+                    (job["job_id"],)
+                ).fetchall()
+                result.append((dict(job), [dict(item) for item in items]))
+        return result
+
+class SyncStore:
+    """Per-user subscription sync settings and the high-water mark of the last queued upload"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    client_id TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    max_bytes_per_video INTEGER,
+                    interval REAL NOT NULL,
+                    backfill INTEGER NOT NULL,
+                    enabled INTEGER NOT NULL,
+                    high_water TEXT,
+                    last_checked REAL,
+                    last_result TEXT
+                )
+            """)
+
+    def upsert(self, client_id: str, settings: SyncSettings):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO subscriptions (client_id, folder, quality, max_bytes_per_video, interval, backfill, enabled)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(client_id) DO UPDATE SET
+                    folder = excluded.folder,
+                    quality = excluded.quality,
+                    max_bytes_per_video = excluded.max_bytes_per_video,
+                    interval = excluded.interval,
+                    backfill = excluded.backfill,
+                    enabled = excluded.enabled
+                """,
+                (
+                    client_id, settings.folder, settings.quality, settings.maxBytesPerVideo,
+                    settings.intervalSeconds, settings.backfill, int(settings.enabled)
+                )
+            )
+
+    def get(self, client_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM subscriptions WHERE client_id = ?", (client_id,)).fetchone()
+        return dict(row) if row else None
+
+    def remove(self, client_id: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM subscriptions WHERE client_id = ?", (client_id,)).rowcount > 0
+
+    def due(self, now: float) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM subscriptions WHERE enabled = 1 AND "
+                "(last_checked IS NULL OR last_checked + interval <= ?)",
+                (now,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def advance(self, client_id: str, high_water: Optional[str], result: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE subscriptions SET high_water = COALESCE(?, high_water), last_checked = ?, last_result = ? "
+                "WHERE client_id = ?",
+                (high_water, time.time(), result, client_id)
+            )
+
+class DownloadItem:
+    def __init__(self, job_id: str, item_id: str, url: str):
+        self.job_id = job_id
+        self.item_id = item_id
+        self.url = url
+        self.video_id = parse_video_id(url)
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.resumed_from = 0
+        self.title: Optional[str] = None
+        self.expected_bytes: Optional[int] = None
+        self.info: Optional[dict] = None
+        self.timings: Dict[str, float] = {}
+        self.ready_at = 0.0
+        self.attempts = 0
+        self.reserved = False
+        self.disk_reserved = 0
+        self.filepath: Optional[str] = None
+        self.notes: List[str] = []
+        # Read from the executor thread by the progress hook
+        self.cancel_requested = False
+
+    def to_dict(self) -> dict:
+        return {
+            "item_id": self.item_id,
+            "job_id": self.job_id,
+            "url": self.url,
+            "video_id": self.video_id,
+            "title": self.title,
+            "expected_bytes": self.expected_bytes,
+            "status": self.status,
+            "error": self.error,
+            "timings": self.timings,
+            "filepath": self.filepath,
+            "notes": self.notes,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "resumed_from": self.resumed_from
+        }
+
+class DownloadJob:
+    def __init__(
+        self,
+        job_id: str,
+        client_id: str,
+        folder: str,
+        quality: str = DEFAULT_QUALITY,
+        max_bytes_per_video: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+        oversize: str = "skip",
+        priority: str = "normal",
+        postprocess: Optional[List[str]] = None,
+        remux_format: str = "mp4",
+        filters: Optional[dict] = None
+    ):
+        self.job_id = job_id
+        self.client_id = client_id
+        self.folder = folder
+        self.quality = quality
+        self.max_bytes_per_video = max_bytes_per_video
+        self.max_total_bytes = max_total_bytes
+        self.oversize = oversize
+        self.priority = priority
+        self.postprocess = [step for step in POSTPROCESS_STEPS if step in (postprocess or [])]
+        self.remux_format = remux_format
+        self.filters = {key: value for key, value in (filters or {}).items() if value}
+        # Filter reason -> number of videos dropped for it
+        self.filtered: Dict[str, int] = {}
+        # With "downgrade", the size cap is part of the format selector itself
+        self.format_spec = profile_format(
+            quality,
+            max_bytes_per_video if oversize == "downgrade" else None,
+            merge=shutil.which("ffmpeg") is not None
+        )
+        self.reserved_bytes = 0
+        self.items: Dict[str, DownloadItem] = {}
+        self.skipped = 0
+        self.resolving = False
+        self.resolve_task: Optional[asyncio.Task] = None
+        self.source_errors: Dict[str, str] = {}
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.cancelled = False
+
+    @property
+    def status(self) -> str:
+        states = [item.status for item in self.items.values()]
+        if self.resolving and not self.cancelled:
+            return "running" if any(state != "queued" for state in states) else "resolving"
+        if any(state in ACTIVE_ITEM_STATES for state in states):
+            if self.cancelled:
+                return "cancelling"
+            return "running" if any(state != "queued" for state in states) else "queued"
+        if self.cancelled:
+            return "cancelled"
+        if "failed" in states:
+            return "completed_with_errors"
+        return "completed"
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for item in self.items.values():
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
+
+    def to_dict(self, include_items: bool = False) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "folder": self.folder,
+            "quality": self.quality,
+            "priority": self.priority,
+            "postprocess": self.postprocess,
+            "max_bytes_per_video": self.max_bytes_per_video,
+            "max_total_bytes": self.max_total_bytes,
+            "reserved_bytes": self.reserved_bytes,
+            "status": self.status,
+            "total_videos": len(self.items),
+            "skipped_videos": self.skipped,
+            "filtered_videos": self.filtered,
+            "counts": self.counts(),
+            "source_errors": self.source_errors,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_items:
+            data["items"] = [item.to_dict() for item in self.items.values()]
+        return data
+
+class FairScheduler:
+    """Strict priority levels with weighted fair queuing across clients and per-client quotas"""
+
+    def __init__(self, client_quota: int):
+        self.client_quota = client_quota
+        self.weights: Dict[str, float] = {}
+        # priority -> client_id -> FIFO of (job, item)
+        self._queues: Dict[str, Dict[str, deque]] = {priority: {} for priority in PRIORITIES}
+        # Service received per client divided by weight
+        self._virtual_time: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+
+    def _weight(self, client_id: str) -> float:
+        return self.weights.get(client_id, 1.0)
+
+    def _backlogged(self) -> set:
+        return {client_id for queues in self._queues.values() for client_id in queues}
+
+    def put(self, job: "DownloadJob", item: "DownloadItem"):
+        backlogged = self._backlogged()
+        if job.client_id not in backlogged:
+            # Returning clients start level with the waiting ones instead of owing or being owed service
+            floor = min((self._virtual_time[c] for c in backlogged), default=0.0)
+            self._virtual_time[job.client_id] = max(self._virtual_time.get(job.client_id, 0.0), floor)
+        self._queues[job.priority].setdefault(job.client_id, deque()).append((job, item))
+        self._wakeup.set()
+
+    def _pick(self) -> Optional[tuple]:
+        for priority in PRIORITIES:
+            queues = self._queues[priority]
+            for client_id in list(queues):
+                # Drop entries cancelled while waiting
+                while queues[client_id] and queues[client_id][0][1].status != "queued":
+                    queues[client_id].popleft()
+                if not queues[client_id]:
+                    del queues[client_id]
+            eligible = [
+                client_id for client_id in queues
+                if not self.client_quota or self._active.get(client_id, 0) < self.client_quota
+            ]
+            if eligible:
+                client_id = min(eligible, key=lambda c: self._virtual_time[c])
+                self._virtual_time[client_id] += 1.0 / self._weight(client_id)
+                self._active[client_id] = self._active.get(client_id, 0) + 1
+                return queues[client_id].popleft()
+        return None
+
+    async def get(self) -> tuple:
+        while True:
+            entry = self._pick()
+            if entry:
+                return entry
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def release(self, client_id: str):
+        """Mark one of the client's videos as having left the pipeline"""
+        self._active[client_id] = max(0, self._active.get(client_id, 0) - 1)
+        self._wakeup.set()
+
+    def qsize(self) -> int:
+        return sum(len(queue) for queues in self._queues.values() for queue in queues.values())
+
+    def positions(self, job: "DownloadJob") -> Dict[str, int]:
+        """Approximate number of videos that will be dispatched before each of the job's queued videos"""
+        ahead = 0
+        for priority in PRIORITIES:
+            if priority == job.priority:
+                break
+            ahead += sum(len(queue) for queue in self._queues[priority].values())
+
+        queues = self._queues[job.priority]
+        own = queues.get(job.client_id, deque())
+        weight = self._weight(job.client_id)
+        positions = {}
+        for index, (queued_job, item) in enumerate(own):
+            if queued_job is not job:
+                continue
+            # Other clients get service in proportion to their weights while this item waits
+            others = sum(
+                min(len(queue), int(index * self._weight(client_id) / weight))
+                for client_id, queue in queues.items() if client_id != job.client_id
+            )
+            positions[item.item_id] = ahead + index + others
+        return positions
+
+class JobManager:
+    """Queues download items and feeds them to a fixed-size pool of workers"""
+
+    def __init__(
+        self,
+        worker_count: int,
+        archive: DownloadArchive,
+        journal: JobJournal,
+        metadata_worker_count: int,
+        transfer_queue_size: int,
+        client_quota: int
+    ):
+        self.worker_count = worker_count
+        self.client_quota = client_quota
+        self.metadata_worker_count = metadata_worker_count
+        self.transfer_queue_size = transfer_queue_size
+        self.archive = archive
+        self.journal = journal
+        self.jobs: Dict[str, DownloadJob] = {}
+        self.primary = False
+        # Items waiting for metadata extraction
+        self._scheduler: Optional[FairScheduler] = None
+        # Extracted items waiting for a transfer slot; bounded so extraction runs only a little ahead
+        self._transfer_queue: Optional[asyncio.Queue] = None
+        # Downloaded items waiting to be merged, converted and checksummed
+        self._postprocess_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.stage_stats = {
+            stage: {"active": 0, "completed": 0, "failed": 0, "total_seconds": 0.0}
+            for stage in ("metadata", "transfer", "postprocess")
+        }
+
+    async def start(self):
+        self._scheduler = FairScheduler(self.client_quota)
+        self._transfer_queue = asyncio.Queue(maxsize=self.transfer_queue_size)
+        self._postprocess_queue = asyncio.Queue()
+        # Only one worker sharing the journal resumes jobs and runs background syncs
+        self.primary = self.journal.claim_restore()
+        if self.primary:
+            self._restore()
+        else:
+            logger.info("Another worker holds the job journal, not resuming unfinished jobs")
+        self._workers = [
+            asyncio.create_task(self._metadata_worker(i)) for i in range(self.metadata_worker_count)
+        ] + [
+            asyncio.create_task(self._transfer_worker(i)) for i in range(self.worker_count)
+        ] + [
+            asyncio.create_task(self._postprocess_worker(i)) for i in range(POSTPROCESS_WORKERS)
+        ] + [
+            asyncio.create_task(self._report_queue()),
+            asyncio.create_task(self._maintain_journal())
+        ]
+        if state_backend.shared:
+            self._workers.append(asyncio.create_task(self._share_jobs()))
+        logger.info(
+            f"Started {self.metadata_worker_count} metadata workers and {self.worker_count} download workers"
+        )
+
+    async def _maintain_journal(self):
+        """Heartbeat the jobs this process owns; the primary also takes over jobs of workers that died"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(JOURNAL_HEARTBEAT_INTERVAL)
+            try:
+                await loop.run_in_executor(None, self.journal.heartbeat)
+                if self.primary:
+                    self._restore()
+                cutoff = datetime.now() - timedelta(seconds=JOB_RETENTION)
+                self._evict_finished(cutoff)
+                await loop.run_in_executor(None, self.journal.prune, cutoff)
+            except Exception as e:
+                logger.error(f"Job journal maintenance error: {e}")
+
+    def _evict_finished(self, cutoff: datetime):
+        """Forget jobs that finished before cutoff, so per-job loops only walk recent jobs"""
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            logger.info(f"Evicted {len(expired)} finished jobs")
+
+    def _restore(self):
+        """Re-queue the unfinished items of jobs whose owning process is gone"""
+        for job_row, item_rows in self.journal.load_unfinished():
+            options = json.loads(job_row["options"] or "{}")
+            job = DownloadJob(
+                job_row["job_id"],
+                job_row["client_id"],
+                job_row["folder"],
+                job_row["format"] if job_row["format"] in QUALITY_PROFILES else DEFAULT_QUALITY,
+                options.get("max_bytes_per_video"),
+                options.get("max_total_bytes"),
+                options.get("oversize", "skip"),
+                options.get("priority", "normal"),
+                options.get("postprocess"),
+                options.get("remux_format", "mp4"),
+                options.get("filters")
+            )
+            job.cancelled = bool(job_row["cancelled"])
+            job.created_at = datetime.fromisoformat(job_row["created_at"])
+            if job_row["resolving"]:
+                logger.warning(f"Job {job.job_id} was interrupted while resolving sources; resuming resolved videos only")
+                self.journal.record_job(job)
+            self.jobs[job.job_id] = job
+
+            for row in item_rows:
+                item = DownloadItem(job.job_id, row["item_id"], row["url"])
+                item.status = row["status"]
+                item.error = row["error"]
+                job.items[item.item_id] = item
+                if item.status in JobJournal.UNFINISHED_STATES and job.cancelled:
+                    # Cancelled before the restart: nothing to resume, and only partial transfers to remove
+                    transferred = item.status == "processing"
+                    item.status = "cancelled"
+                    item.finished_at = datetime.now()
+                    self.journal.record_item(item)
+                    if item.video_id and not transferred:
+                        remove_staged_files(job.folder, item.video_id)
+                elif item.status in JobJournal.UNFINISHED_STATES:
+                    # yt-dlp continues from the existing .part file
+                    item.status = "queued"
+                    item.resumed_from = row["downloaded_bytes"]
+                    self._scheduler.put(job, item)
+                if item.status not in ACTIVE_ITEM_STATES:
+                    progress_bus.settle(job.job_id, item.item_id)
+            self._settle_job(job)
+            logger.info(f"Resumed job {job.job_id} with {job.counts().get('queued', 0)} pending videos")
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.resolve_task:
+                job.resolve_task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def create_job(self, client_id: str, folder: str, **options) -> DownloadJob:
+        job = DownloadJob(os.urandom(8).hex(), client_id, folder, **options)
+        self.jobs[job.job_id] = job
+        self.journal.record_job(job)
+        return job
+
+    def _known(self, job: DownloadJob, video_id: str) -> bool:
+        return (
+            any(item.video_id == video_id for item in job.items.values())
+            or self.archive.contains(video_id, job.folder, job.quality)
+        )
+
+    def enqueue(self, job: DownloadJob, url: str) -> Optional[DownloadItem]:
+        """Queue a URL unless it is already archived or already part of the job"""
+        video_id = parse_video_id(url)
+        if video_id and self._known(job, video_id):
+            logger.debug(f"Skipping already downloaded video {video_id}")
+            job.skipped += 1
+            return None
+
+        item = DownloadItem(job.job_id, f"video_{len(job.items) + 1}", url)
+        job.items[item.item_id] = item
+        self.journal.record_item(item)
+        self._scheduler.put(job, item)
+        progress_bus.track_job(job.job_id, len(job.items), job.status)
+        return item
+
+    def start_resolution(self, job: DownloadJob, sources: Dict[str, object], lookup=None):
+        """Resolve all sources concurrently in the background, queuing URLs page by page
+
+        lookup(video_ids) returns videos().list resources by ID; it is needed when the job has filters.
+        """
+        job.resolving = True
+        self.journal.record_job(job)
+        job.resolve_task = asyncio.create_task(self._resolve(job, sources, lookup))
+
+    async def _apply_filters(self, job: DownloadJob, urls: List[str], lookup) -> List[tuple]:
+        """Drop videos failing the job's filters; returns (url, title) for the rest"""
+        # Videos that would be skipped anyway are not looked up
+        candidates = [
+            video_id for video_id in dict.fromkeys(parse_video_id(url) for url in urls)
+            if video_id and not self._known(job, video_id)
+        ]
+        details = await lookup(candidates) if candidates else {}
+        kept = []
+        for url in urls:
+            video_id = parse_video_id(url)
+            if video_id not in candidates:
+                kept.append((url, None))
+                continue
+            video = details.get(video_id)
+            reason = filter_reason(video, job.filters)
+            if reason:
+                job.filtered[reason] = job.filtered.get(reason, 0) + 1
+                continue
+            kept.append((url, video["snippet"].get("title")))
+        return kept
+
+    async def _resolve(self, job: DownloadJob, sources: Dict[str, object], lookup=None):
+        async def drain(name, pages):
+            try:
+                async for urls in pages:
+                    if job.cancelled:
+                        break
+                    if job.filters and lookup:
+                        entries = await self._apply_filters(job, urls, lookup)
+                    else:
+                        entries = [(url, None) for url in urls]
+                    for url, title in entries:
+                        item = self.enqueue(job, url)
+                        if item and title:
+                            item.title = title
+            except Exception as e:
+                logger.error(f"Source resolution error for {name} in job {job.job_id}: {e}")
+                job.source_errors[name] = str(e)
+                progress_bus.publish(job.client_id, {
+                    'job_id': job.job_id,
+                    'source': name,
+                    'status': 'error',
+                    'error': f"Failed to resolve {name} videos: {e}"
+                })
+
+        try:
+            await asyncio.gather(*(drain(name, pages) for name, pages in sources.items()))
+        finally:
+            job.resolving = False
+            self.journal.record_job(job)
+            self._settle_job(job)
+
+    def get_job(self, client_id: str, job_id: str) -> DownloadJob:
+        job = self.jobs.get(job_id)
+        if not job or job.client_id != client_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def get_item(self, client_id: str, job_id: str, item_id: str) -> DownloadItem:
+        job = self.get_job(client_id, job_id)
+        item = job.items.get(item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    def list_jobs(self, client_id: str) -> List[DownloadJob]:
+        return [job for job in self.jobs.values() if job.client_id == client_id]
+
+    def cancel_item(self, item: DownloadItem):
+        item.cancel_requested = True
+        if item.status in ("queued", "ready"):
+            job = self.jobs[item.job_id]
+            if item.status == "ready":
+                self._scheduler.release(job.client_id)
+            self._release_reservation(job, item)
+            item.status = "cancelled"
+            item.info = None
+            item.finished_at = datetime.now()
+            self.journal.record_item(item)
+            self._settle_job(job, item)
+
+    def cancel_job(self, job: DownloadJob):
+        job.cancelled = True
+        self.journal.record_job(job)
+        for item in job.items.values():
+            self.cancel_item(item)
+        self._settle_job(job)
+
+    def apply_control(self, message: dict):
+        """Apply a cancellation sent by another worker if the job runs here"""
+        job = self.jobs.get(message.get("job_id"))
+        if not job or job.client_id != message.get("client_id"):
+            return
+        if message.get("action") == "cancel_job":
+            self.cancel_job(job)
+        elif message.get("action") == "cancel_item" and message.get("item_id") in job.items:
+            self.cancel_item(job.items[message["item_id"]])
+
+    async def _share_jobs(self):
+        """Periodically store snapshots of the jobs running here so any worker can answer for them"""
+        finished = set()
+        while True:
+            await asyncio.sleep(JOB_SNAPSHOT_INTERVAL)
+            finished &= self.jobs.keys()
+            for job in list(self.jobs.values()):
+                if job.job_id in finished:
+                    continue
+                done = job.status in FINISHED_JOB_STATES
+                try:
+                    await state_backend.put_job(job.job_id, job.client_id, self.describe_job(job), done)
+                except Exception as e:
+                    logger.error(f"Failed to share job {job.job_id}: {e}")
+                    continue
+                if done:
+                    finished.add(job.job_id)
+
+    def estimate_start(self, position: int) -> Optional[float]:
+        """Seconds until the video at a queue position starts, from recent stage timings"""
+        per_video = 0.0
+        for stats in self.stage_stats.values():
+            done = stats["completed"] + stats["failed"]
+            if not done:
+                return None
+            per_video += stats["total_seconds"] / done
+        return (position + 1) * per_video / max(1, int(transfer_limiter.limit))
+
+    def queue_info(self, job: DownloadJob) -> dict:
+        positions = self._scheduler.positions(job)
+        if not positions:
+            return {}
+        position = min(positions.values())
+        return {"queue_position": position, "estimated_start": self.estimate_start(position)}
+
+    def describe_item(self, job: DownloadJob, item: DownloadItem, positions: Optional[dict] = None) -> dict:
+        data = item.to_dict()
+        if positions is None:
+            positions = self._scheduler.positions(job)
+        if item.item_id in positions:
+            data["queue_position"] = positions[item.item_id]
+            data["estimated_start"] = self.estimate_start(positions[item.item_id])
+        return data
+
+    def describe_job(self, job: DownloadJob) -> dict:
+        data = job.to_dict()
+        data.update(self.queue_info(job))
+        positions = self._scheduler.positions(job)
+        data["items"] = [self.describe_item(job, item, positions) for item in job.items.values()]
+        return data
+
+    async def _report_queue(self):
+        """Periodically push queue positions of waiting jobs to their clients"""
+        reported: Dict[str, int] = {}
+        while True:
+            await asyncio.sleep(QUEUE_REPORT_INTERVAL)
+            for job in list(self.jobs.values()):
+                info = self.queue_info(job)
+                if not info:
+                    reported.pop(job.job_id, None)
+                    continue
+                if reported.get(job.job_id) == info["queue_position"]:
+                    continue
+                reported[job.job_id] = info["queue_position"]
+                progress_bus.publish(job.client_id, dict(info, job_id=job.job_id, status='queued'))
+
+    def stats(self) -> dict:
+        stages = {}
+        for stage, stats in self.stage_stats.items():
+            done = stats["completed"] + stats["failed"]
+            stages[stage] = dict(stats, average_seconds=stats["total_seconds"] / done if done else None)
+        stages["metadata"]["queue_depth"] = self._scheduler.qsize()
+        stages["transfer"]["queue_depth"] = self._transfer_queue.qsize()
+        stages["postprocess"]["queue_depth"] = self._postprocess_queue.qsize()
+        return stages
+
+    def _check_budget(self, job: DownloadJob, item: DownloadItem) -> Optional[str]:
+        """Reserve the item's expected bytes against the job's budgets, or return why it cannot fit"""
+        size = item.expected_bytes
+        if size is None:
+            return None
+        if job.max_bytes_per_video and size > job.max_bytes_per_video:
+            return f"Expected size {size} bytes exceeds the per-video budget of {job.max_bytes_per_video} bytes"
+        if job.max_total_bytes and job.reserved_bytes + size > job.max_total_bytes:
+            return f"Job byte budget of {job.max_total_bytes} bytes exhausted"
+        job.reserved_bytes += size
+        item.reserved = True
+        return None
+
+    def _release_reservation(self, job: DownloadJob, item: DownloadItem):
+        # Frees the budget of a video that will not be transferred (now)
+        if item.reserved:
+            job.reserved_bytes -= item.expected_bytes
+            item.reserved = False
+        self._release_disk(job, item)
+
+    def _release_disk(self, job: DownloadJob, item: DownloadItem):
+        # Once the file is complete, or gone, free space itself reflects it
+        if item.disk_reserved:
+            disk_space.release(job.folder, item.disk_reserved)
+            item.disk_reserved = 0
+
+    def _settle_job(self, job: DownloadJob, item: Optional[DownloadItem] = None):
+        if item is not None:
+            progress_bus.settle(job.job_id, item.item_id)
+        status = job.status
+        progress_bus.track_job(job.job_id, len(job.items), status)
+        if status in FINISHED_JOB_STATES:
+            job.finished_at = job.finished_at or datetime.now()
+            # Makes sure the job's final frame goes out, carrying its terminal status
+            progress_bus.publish(job.client_id, {'job_id': job.job_id, 'status': status})
+            progress_bus.finish_job(job.job_id)
+            client_active = any(
+                other.client_id == job.client_id and other.status not in FINISHED_JOB_STATES
+                for other in self.jobs.values()
+            )
+            bandwidth_governor.forget(job.job_id, None if client_active else job.client_id)
+
+    def _skip_item(self, job: DownloadJob, item: DownloadItem, reason: str):
+        logger.info(f"Skipping {item.item_id} of job {job.job_id}: {reason}")
+        self._scheduler.release(job.client_id)
+        item.status = "skipped"
+        item.error = reason
+        item.finished_at = datetime.now()
+        self.journal.record_item(item)
+        progress_bus.publish(job.client_id, {
+            'job_id': job.job_id,
+            'video_id': item.item_id,
+            'status': 'skipped',
+            'reason': reason
+        })
+        self._settle_job(job, item)
+
+    def _retry_or_fail(self, job: DownloadJob, item: DownloadItem, error: Exception):
+        """Re-queue a retryable failure after a jittered backoff, or fail the item"""
+        if item.cancel_requested or not is_retryable_error(error) or item.attempts >= MAX_RETRIES:
+            self._finish_item(job, item, error)
+            return
+
+        delay = backoff_delay(item.attempts)
+        if isinstance(error, CircuitOpenError):
+            delay = max(delay, error.retry_after)
+        item.attempts += 1
+        self._release_reservation(job, item)
+        item.status = "queued"
+        item.error = str(error)
+        item.info = None
+        self.journal.record_item(item)
+        logger.info(f"Retrying {item.item_id} of job {job.job_id} in {delay:.1f}s: {error}")
+        progress_bus.publish(job.client_id, {
+            'job_id': job.job_id,
+            'video_id': item.item_id,
+            'status': 'retrying',
+            'attempt': item.attempts,
+            'delay': delay,
+            'error': str(error)
+        })
+        # Retries restart at the metadata stage since stream URLs may have expired
+        self._scheduler.release(job.client_id)
+        asyncio.get_running_loop().call_later(delay, self._scheduler.put, job, item)
+
+    async def _guarded(self, breaker_name: str, coro_factory, limiter: Optional["AdaptiveLimiter"] = None):
+        """Run a stage call behind its circuit breaker, feeding throttling signals to the limiter"""
+        breaker = circuit_breakers.get(breaker_name)
+        breaker.before_call()
+        try:
+            if limiter:
+                async with limiter:
+                    result = await coro_factory()
+            else:
+                result = await coro_factory()
+        except Exception as e:
+            if is_retryable_error(e):
+                breaker.record_failure()
+                if limiter and is_throttle_error(e):
+                    limiter.record_throttle()
+            else:
+                # Per-video failures (private, removed...) say nothing about the endpoint
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    def _finish_item(
+        self,
+        job: DownloadJob,
+        item: DownloadItem,
+        error: Optional[Exception] = None,
+        released: bool = False
+    ):
+        if not released:
+            self._scheduler.release(job.client_id)
+        if error is not None:
+            self._release_reservation(job, item)
+            if item.video_id and item.status != "processing":
+                # Partial files of a video that will not be retried only take up space; completed
+                # transfers are kept even when post-processing fails
+                asyncio.get_running_loop().run_in_executor(
+                    None, remove_staged_files, job.folder, item.video_id
+                )
+        self._release_disk(job, item)
+        if error is None:
+            item.status = "finished"
+        elif item.cancel_requested:
+            item.status = "cancelled"
+            progress_bus.publish(job.client_id, {
+                'job_id': job.job_id,
+                'video_id': item.item_id,
+                'status': 'cancelled'
+            })
+        else:
+            item.status = "failed"
+            item.error = str(error)
+        item.info = None
+        item.finished_at = datetime.now()
+        self.journal.record_item(item)
+        self._settle_job(job, item)
+
+    async def _run_stage(self, stage: str, item: DownloadItem, coro):
+        stats = self.stage_stats[stage]
+        stats["active"] += 1
+        started = time.monotonic()
+        try:
+            result = await coro
+            stats["completed"] += 1
+            return result
+        except Exception:
+            stats["failed"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            item.timings[stage] = elapsed
+            stats["total_seconds"] += elapsed
+            stats["active"] -= 1
+            metrics.observe("ytdl_stage_duration_seconds", elapsed, stage=stage)
+
+    async def _metadata_worker(self, worker_id: int):
+        while True:
+            job, item = await self._scheduler.get()
+            try:
+                item.status = "extracting"
+                item.started_at = datetime.now()
+                self.journal.record_item(item)
+                try:
+                    info = await self._run_stage("metadata", item, self._guarded(
+                        "extract",
+                        lambda: extract_video_info(
+                            item.url,
+                            job.folder,
+                            item.item_id,
+                            job.client_id,
+                            job_id=job.job_id,
+                            format_spec=job.format_spec
+                        )
+                    ))
+                except Exception as e:
+                    self._retry_or_fail(job, item, e)
+                    continue
+
+                if item.cancel_requested:
+                    self._finish_item(job, item, Exception("Cancelled"))
+                    continue
+
+                item.title = info.get('title')
+                item.expected_bytes = expected_size(info)
+                progress_bus.expect(job.job_id, item.item_id, item.expected_bytes)
+                skip_reason = self._check_budget(job, item)
+                if skip_reason:
+                    self._skip_item(job, item, skip_reason)
+                    continue
+                footprint = disk_footprint(info, item.expected_bytes)
+                skip_reason = await disk_space.reserve(job.folder, footprint)
+                if skip_reason:
+                    self._release_reservation(job, item)
+                    self._skip_item(job, item, skip_reason)
+                    continue
+                item.disk_reserved = footprint
+
+                item.info = info
+                item.status = "ready"
+                item.ready_at = time.monotonic()
+                # Blocks while the transfer stage is saturated
+                await self._transfer_queue.put((job, item))
+            except Exception as e:
+                logger.error(f"Metadata worker {worker_id} error on {item.item_id}: {e}")
+                # Errors after extraction (disk reservation, journal writes...) must still settle the item,
+                # or it stays "extracting" with its scheduler slot held and the job never finishes
+                if item.status in ("extracting", "ready"):
+                    self._retry_or_fail(job, item, e)
+
+    async def _transfer_worker(self, worker_id: int):
+        while True:
+            job, item = await self._transfer_queue.get()
+            try:
+                if item.status != "ready":
+                    continue
+
+                item.timings["waiting"] = time.monotonic() - item.ready_at
+                item.status = "downloading"
+                self.journal.record_item(item)
+                try:
+                    download = await self._run_stage("transfer", item, self._guarded(
+                        "download",
+                        lambda: download_video(
+                            item.url,
+                            job.folder,
+                            item.item_id,
+                            job.client_id,
+                            job_id=job.job_id,
+                            is_cancelled=lambda: item.cancel_requested,
+                            format_spec=job.format_spec,
+                            info=item.info
+                        ),
+                        transfer_limiter
+                    ))
+                except Exception as e:
+                    self._retry_or_fail(job, item, e)
+                    continue
+
+                # The transfer slot and the client's quota are free while the file is processed
+                self._scheduler.release(job.client_id)
+                item.status = "processing"
+                item.info = None
+                self.journal.record_item(item)
+                progress_bus.publish(job.client_id, {
+                    'job_id': job.job_id,
+                    'video_id': item.item_id,
+                    'status': 'processing',
+                    'steps': ["merge"] * (len(download['parts']) > 1) + job.postprocess + ["checksum"]
+                })
+                self._postprocess_queue.put_nowait((job, item, download))
+            except Exception as e:
+                logger.error(f"Download worker {worker_id} error on {item.item_id}: {e}")
+                if item.status == "downloading":
+                    self._retry_or_fail(job, item, e)
+                elif item.status == "processing":
+                    # The transfer slot is already released
+                    self._finish_item(job, item, e, released=True)
+            finally:
+                self._transfer_queue.task_done()
+
+    async def _postprocess_worker(self, worker_id: int):
+        while True:
+            job, item, download = await self._postprocess_queue.get()
+            try:
+                if item.cancel_requested:
+                    self._finish_item(job, item, Exception("Cancelled"), released=True)
+                    continue
+                try:
+                    result = await self._run_stage("postprocess", item, postprocessing_pool.run(dict(
+                        download,
+                        steps=job.postprocess,
+                        remux_format=job.remux_format
+                    )))
+                except Exception as e:
+                    logger.error(f"Post-processing error for {item.item_id}: {e}")
+                    progress_bus.publish(job.client_id, {
+                        'job_id': job.job_id,
+                        'video_id': item.item_id,
+                        'status': 'error',
+                        'error': f"Post-processing failed: {e}"
+                    })
+                    self._finish_item(job, item, e, released=True)
+                    continue
+
+                item.filepath = result['filepath']
+                item.notes = result['notes']
+                item.timings.update({f"postprocess.{step}": seconds for step, seconds in result['timings'].items()})
+                if item.video_id:
+                    await asyncio.get_running_loop().run_in_executor(None, partial(
+                        self.archive.record, job.client_id, item.video_id, job.folder, job.quality,
+                        result['filepath'], result['checksum']
+                    ))
+                progress_bus.publish(job.client_id, {
+                    'job_id': job.job_id,
+                    'video_id': item.item_id,
+                    'status': 'processed',
+                    'filepath': result['filepath'],
+                    'timings': result['timings'],
+                    'notes': result['notes']
+                })
+                self._finish_item(job, item, released=True)
+            except Exception as e:
+                logger.error(f"Post-processing worker {worker_id} error on {item.item_id}: {e}")
+                if item.status == "processing":
+                    self._finish_item(job, item, e, released=True)
+            finally:
+                self._postprocess_queue.task_done()
+
+class SubscriptionSyncer:
+    """Polls each user's home feed for uploads newer than their high-water mark and queues them"""
+
+    def __init__(self, store: SyncStore, check_interval: float):
+        self.store = store
+        self.check_interval = check_interval
+        self._running: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for subscription in self.store.due(time.time()):
+                if subscription["client_id"] not in self._running:
+                    asyncio.create_task(self.sync(subscription))
+
+    async def sync(self, subscription: dict) -> dict:
+        """Queue uploads published since the high-water mark; returns what was queued"""
+        client_id = subscription["client_id"]
+        if client_id in self._running:
+            return {"status": "running"}
+        self._running.add(client_id)
+        try:
+            credentials = await auth_manager.get_valid_credentials(client_id)
+            if not credentials:
+                self.store.advance(client_id, None, "no_credentials")
+                metrics.inc("ytdl_sync_polls_total", outcome="no_credentials")
+                return {"status": "no_credentials"}
+
+            high_water = subscription["high_water"]
+            if high_water is None and not subscription["backfill"]:
+                # First poll without backfill: only uploads from now on are queued
+                now = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+                self.store.advance(client_id, now, "initialized")
+                return {"status": "initialized", "high_water": now}
+
+            uploads = [
+                upload
+                async for page in fetch_new_uploads(
+                    credentials,
+                    client_id,
+                    high_water,
+                    SYNC_MAX_VIDEOS if high_water else subscription["backfill"]
+                )
+                for upload in page
+            ]
+            if not uploads:
+                self.store.advance(client_id, None, "unchanged")
+                metrics.inc("ytdl_sync_polls_total", outcome="unchanged")
+                return {"status": "unchanged"}
+
+            os.makedirs(subscription["folder"], exist_ok=True)
+            job = job_manager.create_job(
+                client_id,
+                subscription["folder"],
+                quality=subscription["quality"] if subscription["quality"] in QUALITY_PROFILES else DEFAULT_QUALITY,
+                max_bytes_per_video=subscription["max_bytes_per_video"],
+                priority="bulk"
+            )
+            urls = [url for url, _ in uploads]
+
+            async def new_uploads():
+                yield urls
+
+            job_manager.start_resolution(job, {"subscriptions": new_uploads()})
+            newest = max((published for _, published in uploads), key=published_at)
+            self.store.advance(client_id, newest, f"queued {len(urls)}")
+            metrics.inc("ytdl_sync_polls_total", outcome="new")
+            logger.info(f"Subscription sync queued {len(urls)} uploads for client {client_id} in job {job.job_id}")
+            return {"status": "queued", "job_id": job.job_id, "videos": len(urls), "high_water": newest}
+        except Exception as e:
+            logger.error(f"Subscription sync error for client {client_id}: {e}")
+            self.store.advance(client_id, None, f"error: {e}")
+            metrics.inc("ytdl_sync_polls_total", outcome="failed")
+            return {"status": "error", "error": str(e)}
+        finally:
+            self._running.discard(client_id)
+
+# Download engines
+def expected_size(info: dict) -> Optional[int]:
+    """Best estimate of the bytes a download of the selected formats will transfer"""
+    formats = info.get('requested_formats') or [info]
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+    if not all(sizes):
+        return None
+    return int(sum(sizes))
+
+def is_forbidden_error(error: Exception) -> bool:
+    if isinstance(error, YouTubeApiError):
+        # The Data API also answers rate limiting with 403, but names it in the reason
+        return error.status == 403 and error.reason not in API_RATE_LIMIT_REASONS
+    return any(marker in str(error) for marker in FORBIDDEN_MARKERS)
+
+def is_throttle_error(error: Exception) -> bool:
+    if is_forbidden_error(error):
+        return False
+    if isinstance(error, YouTubeApiError) and (error.status == 429 or error.reason in API_RATE_LIMIT_REASONS):
+        return True
+    return any(marker in str(error) for marker in THROTTLE_MARKERS)
+
+def is_retryable_error(error: Exception) -> bool:
+    if is_forbidden_error(error):
+        return False
+    if isinstance(error, YouTubeApiError):
+        return error.status in (429, 500, 502, 503, 504) or is_throttle_error(error)
+    if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    return any(marker in str(error) for marker in RETRYABLE_MARKERS)
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Fails calls fast after repeated failures, then lets a single trial call through"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+class CircuitBreakers:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+        return self._breakers[name]
+
+    def status(self) -> dict:
+        return {name: breaker.status() for name, breaker in self._breakers.items()}
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: grows by one while throughput rises, halves on throttling"""
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int, interval: float):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.interval = interval
+        self.active = 0
+        self.throughput = 0.0
+        self._condition = asyncio.Condition()
+        # Updated from transfer threads
+        self._lock = threading.Lock()
+        self._units = 0
+        self._throttles = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def record_units(self, units: float):
+        """Record completed work (bytes or calls); safe to call from any thread"""
+        with self._lock:
+            self._units += units
+
+    def record_throttle(self):
+        with self._lock:
+            self._throttles += 1
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.adjust()
+
+    async def adjust(self):
+        with self._lock:
+            units, self._units = self._units, 0
+            throttles, self._throttles = self._throttles, 0
+        throughput = units / self.interval
+
+        previous = self.limit
+        if throttles:
+            self.limit = max(self.minimum, self.limit / 2)
+        elif self.active >= int(self.limit) and throughput >= self.throughput * 0.95:
+            # Only grow while saturated and more concurrency is still paying off
+            self.limit = min(self.maximum, self.limit + 1)
+        self.throughput = throughput
+
+        if int(self.limit) != int(previous):
+            logger.info(f"{self.name} concurrency limit {int(previous)} -> {int(self.limit)}")
+            async with self._condition:
+                self._condition.notify_all()
+
+    def status(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "active": self.active,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "throughput": self.throughput
+        }
+
+class BandwidthShare:
+    """One transfer's slice of the bandwidth; rate is read from transfer threads"""
+
+    def __init__(self, key: str, job_id: str, client_id: str):
+        self.key = key
+        self.job_id = job_id
+        self.client_id = client_id
+        self.rate = 0.0
+        self.listener = None
+
+    def set_rate(self, rate: float):
+        self.rate = rate
+        if self.listener:
+            self.listener(rate)
+
+class BandwidthGovernor:
+    """Splits global, per-client and per-job bandwidth caps fairly between active transfers"""
+
+    def __init__(self, global_limit: float, client_limit: float, job_limit: float):
+        self.global_limit = global_limit
+        self.default_client_limit = client_limit
+        self.default_job_limit = job_limit
+        self.client_limits: Dict[str, float] = {}
+        self.job_limits: Dict[str, float] = {}
+        self._shares: Dict[str, BandwidthShare] = {}
+
+    def register(self, key: str, job_id: str, client_id: str) -> BandwidthShare:
+        share = BandwidthShare(key, job_id, client_id)
+        self._shares[key] = share
+        self._rebalance()
+        return share
+
+    def unregister(self, share: BandwidthShare):
+        self._shares.pop(share.key, None)
+        self._rebalance()
+
+    def set_limits(
+        self,
+        client_id: Optional[str] = None,
+        client_limit: Optional[float] = None,
+        job_id: Optional[str] = None,
+        job_limit: Optional[float] = None
+    ):
+        """Set a client's or job's own cap; the global cap only comes from BANDWIDTH_LIMIT"""
+        # Clients may lower their own caps but not lift the configured ones
+        if client_id and client_limit is not None:
+            if self.default_client_limit and not 0 < client_limit <= self.default_client_limit:
+                client_limit = self.default_client_limit
+            self.client_limits[client_id] = client_limit
+        if job_id and job_limit is not None:
+            if self.default_job_limit and not 0 < job_limit <= self.default_job_limit:
+                job_limit = self.default_job_limit
+            self.job_limits[job_id] = job_limit
+        self._rebalance()
+
+    def forget(self, job_id: str, client_id: Optional[str] = None):
+        """Drop the cap of a finished job, and of its client once the client has no jobs left"""
+        self.job_limits.pop(job_id, None)
+        if client_id:
+            self.client_limits.pop(client_id, None)
+
+    def _job_cap(self, job_id: str, client_id: str, client_jobs: int) -> float:
+        cap = float("inf")
+        job_limit = self.job_limits.get(job_id, self.default_job_limit)
+        if job_limit:
+            cap = job_limit
+        client_limit = self.client_limits.get(client_id, self.default_client_limit)
+        if client_limit:
+            cap = min(cap, client_limit / client_jobs)
+        return cap
+
+    def _rebalance(self):
+        jobs: Dict[str, List[BandwidthShare]] = {}
+        for share in self._shares.values():
+            jobs.setdefault(share.job_id, []).append(share)
+        client_jobs: Dict[str, int] = {}
+        for shares in jobs.values():
+            client_jobs[shares[0].client_id] = client_jobs.get(shares[0].client_id, 0) + 1
+
+        caps = {
+            job_id: self._job_cap(job_id, shares[0].client_id, client_jobs[shares[0].client_id])
+            for job_id, shares in jobs.items()
+        }
+
+        # Max-min fair split of the global limit: jobs capped below their fair share free it for others
+        allocations = dict(caps)
+        if self.global_limit:
+            remaining = self.global_limit
+            pending = sorted(caps, key=caps.get)
+            while pending:
+                fair = remaining / len(pending)
+                if caps[pending[0]] > fair:
+                    for job_id in pending:
+                        allocations[job_id] = fair
+                    break
+                job_id = pending.pop(0)
+                remaining -= caps[job_id]
+
+        for job_id, shares in jobs.items():
+            allocation = allocations[job_id]
+            rate = allocation / len(shares) if allocation != float("inf") else 0.0
+            for share in shares:
+                share.set_rate(rate)
+
+    def status(self, client_id: str) -> dict:
+        return {
+            "global_limit": self.global_limit,
+            "client_limit": self.client_limits.get(client_id, self.default_client_limit),
+            "job_limits": {
+                job_id: self.job_limits.get(job_id, self.default_job_limit)
+                for job_id in {share.job_id for share in self._shares.values() if share.client_id == client_id}
+            },
+            "transfers": {
+                share.key: share.rate for share in self._shares.values() if share.client_id == client_id
+            }
+        }
+
+class ThreadDownloadEngine:
+    """Runs each extraction and download with a fresh YoutubeDL instance on thread pools"""
+
+    def __init__(self, worker_count: int, metadata_worker_count: int):
+        self.capacity = worker_count + metadata_worker_count
+        self.executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="download")
+        self.metadata_executor = ThreadPoolExecutor(
+            max_workers=metadata_worker_count, thread_name_prefix="metadata"
+        )
+        self.busy = 0
+
+    def saturation(self) -> dict:
+        return {"busy": self.busy, "capacity": self.capacity}
+
+    async def _run(self, executor, func):
+        self.busy += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func)
+        finally:
+            self.busy -= 1
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.metadata_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def extract(self, task: dict) -> dict:
+        def extract():
+            with yt_dlp.YoutubeDL(build_ydl_options(task, [])) as ydl:
+                return run_extract(ydl, task)
+
+        return await self._run(self.metadata_executor, extract)
+
+    async def download(self, task: dict, hook, share: Optional[BandwidthShare] = None) -> dict:
+        hooks = [hook]
+        if share:
+            hooks.append(RateThrottle(lambda: share.rate))
+
+        def download():
+            with transfer_only_ydl(build_ydl_options(task, hooks)) as ydl:
+                return run_download(ydl, task)
+
+        return await self._run(self.executor, download)
 
-class ProgressManager:
-    def __init__(self, websocket_manager, client_id, video_id):
-        self.manager = websocket_manager
-        self.client_id = client_id
-        self.video_id = video_id
-        self._last_update = datetime.now()
-        self.update_interval = timedelta(milliseconds=100)  # Limit updates to 10 times per second
+class ProcessDownloadEngine:
+    """Runs extractions and downloads on long-lived worker processes so they do not contend on the GIL"""
 
-    def create_hook(self):
-        def hook(d):
-            if datetime.now() - self._last_update < self.update_interval:
-                return
+    def __init__(self, worker_count: int, metadata_worker_count: int):
+        # Both pipeline stages draw from one pool sized to their combined concurrency
+        self.worker_count = worker_count + metadata_worker_count
+        self._context = multiprocessing.get_context("spawn")
+        self._result_queue = None
+        self._slots: List[dict] = []
+        self._idle: Optional[asyncio.Queue] = None
+        # task_id -> (future, hook, slot)
+        self._pending: Dict[str, tuple] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._running = False
 
-            status = d.get('status', '')
-            if status == 'downloading':
-                downloaded = d.get('downloaded_bytes', 0)
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                
-                if total > 0:
-                    progress = (downloaded / total) * 100
-                    asyncio.create_task(self.manager.broadcast_to_client(
-                        self.client_id,
-                        json.dumps({
-                            'video_id': self.video_id,
-                            'status': 'downloading',
-                            'progress': progress,
-                            'speed': d.get('speed', 0),
-                            'eta': d.get('eta', 0)
-                        })
-                    ))
-            
-            elif status == 'finished':
-                asyncio.create_task(self.manager.broadcast_to_client(
-                    self.client_id,
-                    json.dumps({
-                        'video_id': self.video_id,
-                        'status': 'finished',
-                        'progress': 100
-                    })
-                ))
-            
-            self._last_update = datetime.now()
-        
-        return hook
+    def _spawn(self, slot: dict):
+        slot['tasks'] = self._context.Queue()
+        slot['process'] = self._context.Process(
+            target=process_worker_main,
+            args=(slot['tasks'], self._result_queue, slot['cancel'], slot['rate']),
+            daemon=True
+        )
+        slot['process'].start()
 
-class WebSocketManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        self._lock = asyncio.Lock()
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._result_queue = self._context.Queue()
+        self._idle = asyncio.Queue()
+        for index in range(self.worker_count):
+            slot = {
+                'index': index,
+                'cancel': self._context.Event(),
+                # Bytes per second the worker's current transfer may use; 0 is unlimited
+                'rate': self._context.Value('d', 0.0, lock=False)
+            }
+            self._spawn(slot)
+            self._slots.append(slot)
+            self._idle.put_nowait(slot)
 
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        async with self._lock:
-            if client_id not in self.active_connections:
-                self.active_connections[client_id] = []
-            self.active_connections[client_id].append(websocket)
-        logger.info(f"New WebSocket connection established for client {client_id}")
+        self._running = True
+        self._reader = threading.Thread(target=self._read_results, name="download-results", daemon=True)
+        self._reader.start()
+        self._monitor = asyncio.create_task(self._monitor_workers())
+        logger.info(f"Started {self.worker_count} download worker processes")
 
-    async def disconnect(self, websocket: WebSocket, client_id: str):
-        async with self._lock:
-            if client_id in self.active_connections:
-                try:
-                    self.active_connections[client_id].remove(websocket)
-                    if not self.active_connections[client_id]:
-                        del self.active_connections[client_id]
-                except ValueError:
-                    pass
-        logger.info(f"WebSocket connection closed for client {client_id}")
+    async def stop(self):
+        self._running = False
+        if self._monitor:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        for slot in self._slots:
+            slot['tasks'].put(None)
+        for slot in self._slots:
+            await self._loop.run_in_executor(None, slot['process'].join, 5)
+            if slot['process'].is_alive():
+                slot['process'].terminate()
+        if self._reader:
+            await self._loop.run_in_executor(None, self._reader.join, 2)
 
-    async def broadcast_to_client(self, client_id: str, message: str):
-        if client_id not in self.active_connections:
+    def _settle(self, task_id: str, result=None, error: Optional[str] = None):
+        pending = self._pending.pop(task_id, None)
+        if not pending:
             return
-        
-        disconnected = []
-        for connection in self.active_connections[client_id]:
+        future = pending[0]
+
+        def settle():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
+
+        self._loop.call_soon_threadsafe(settle)
+
+    def _read_results(self):
+        while self._running:
             try:
-                await connection.send_text(message)
+                kind, task_id, payload = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if kind == 'progress':
+                pending = self._pending.get(task_id)
+                if not pending or not pending[1]:
+                    continue
+                try:
+                    pending[1](payload)
+                except yt_dlp.utils.DownloadCancelled:
+                    pending[2]['cancel'].set()
+                except Exception as e:
+                    logger.error(f"Progress hook error for task {task_id}: {e}")
+            elif kind == 'done':
+                self._settle(task_id, result=payload)
+            else:
+                self._settle(task_id, error=payload)
+
+    async def _monitor_workers(self):
+        # Runs on its own timer: the result queue is rarely idle while other workers stream progress
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            try:
+                self._check_workers()
             except Exception as e:
-                logger.error(f"Error broadcasting to client {client_id}: {e}")
-                disconnected.append(connection)
-        
-        for conn in disconnected:
-            await self.disconnect(conn, client_id)
+                logger.error(f"Download worker check error: {e}")
 
-class CredentialManager:
-    def __init__(self):
-        self.credentials: Dict[str, Credentials] = {}
-        self._lock = asyncio.Lock()
+    def _check_workers(self):
+        """Fail the task of any worker process that died and start a replacement"""
+        for task_id, (_, _, slot) in list(self._pending.items()):
+            if not slot['process'].is_alive():
+                logger.error(f"Download worker process {slot['index']} exited unexpectedly")
+                self._spawn(slot)
+                self._settle(task_id, error="Download worker process exited unexpectedly")
 
-    async def store(self, client_id: str, credentials: Credentials):
-        async with self._lock:
-            self.credentials[client_id] = credentials
+    def saturation(self) -> dict:
+        return {"busy": self.worker_count - self._idle.qsize(), "capacity": self.worker_count}
 
-    async def get(self, client_id: str) -> Optional[Credentials]:
-        async with self._lock:
-            return self.credentials.get(client_id)
+    async def _submit(self, task: dict, hook, share: Optional[BandwidthShare] = None):
+        slot = await self._idle.get()
+        try:
+            slot['cancel'].clear()
+            slot['rate'].value = share.rate if share else 0.0
+            if share:
+                share.listener = lambda rate: setattr(slot['rate'], 'value', rate)
+            future = self._loop.create_future()
+            self._pending[task['task_id']] = (future, hook, slot)
+            slot['tasks'].put(task)
+            return await future
+        finally:
+            if share:
+                share.listener = None
+            self._pending.pop(task['task_id'], None)
+            self._idle.put_nowait(slot)
 
-    async def remove(self, client_id: str):
-        async with self._lock:
-            self.credentials.pop(client_id, None)
+    async def extract(self, task: dict) -> dict:
+        return await self._submit(dict(task, kind='extract', task_id=f"{task['task_id']}:extract"), None)
 
-class AuthManager:
-    def __init__(self):
-        self.credential_manager = CredentialManager()
-        self._refresh_locks = {}
+    async def download(self, task: dict, hook, share: Optional[BandwidthShare] = None) -> dict:
+        return await self._submit(dict(task, kind='download'), hook, share)
 
-    async def get_valid_credentials(self, client_id: str) -> Optional[Credentials]:
+# Disk space
+def existing_parent(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def folder_usage(folder: str) -> int:
+    """Bytes of the files directly in a download folder, staged partial files excluded"""
+    try:
+        with os.scandir(folder) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file(follow_symlinks=False))
+    except FileNotFoundError:
+        return 0
+
+def disk_footprint(info: dict, expected_bytes: Optional[int]) -> int:
+    """Peak bytes a video occupies: merging writes the output while the separate streams still exist"""
+    if not expected_bytes:
+        return 0
+    return expected_bytes * (2 if len(info.get('requested_formats') or []) > 1 else 1)
+
+def remove_staged_files(folder: str, video_id: str):
+    staging = os.path.join(folder, STAGING_DIR)
+    marker = f"[{video_id}]"
+    try:
+        with os.scandir(staging) as entries:
+            for entry in entries:
+                if marker in entry.name:
+                    os.remove(entry.path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove staged files of {video_id}: {e}")
+
+class DiskSpaceManager:
+    """Admits transfers only when their expected bytes fit the free space and the folder's quota"""
+
+    def __init__(self, headroom: int, default_quota: int):
+        self.headroom = headroom
+        self.default_quota = default_quota
+        self.quotas: Dict[str, int] = {}
+        # Outstanding reservations per filesystem and per folder
+        self._device_reserved: Dict[int, int] = {}
+        self._folder_reserved: Dict[str, int] = {}
+        self._devices: Dict[str, int] = {}
+
+    def quota(self, folder: str) -> int:
+        return self.quotas.get(os.path.abspath(folder), self.default_quota)
+
+    def set_quota(self, folder: str, quota: Optional[int]):
+        if quota is None:
+            self.quotas.pop(os.path.abspath(folder), None)
+        else:
+            self.quotas[os.path.abspath(folder)] = quota
+
+    def _measure(self, folder: str, with_usage: bool) -> tuple:
+        path = existing_parent(folder)
+        return os.stat(path).st_dev, shutil.disk_usage(path).free, folder_usage(folder) if with_usage else 0
+
+    async def reserve(self, folder: str, size: int) -> Optional[str]:
+        """Reserve size bytes for a transfer into folder, or return why it cannot fit"""
+        folder = os.path.abspath(folder)
+        quota = self.quota(folder)
+        device, free, used = await asyncio.get_running_loop().run_in_executor(
+            None, self._measure, folder, bool(quota)
+        )
+        self._devices[folder] = device
+        # Bytes already written by transfers in flight count twice here, which errs on the safe side
+        available = free - self._device_reserved.get(device, 0) - self.headroom
+        if size > available:
+            return f"Not enough free disk space: {size} bytes needed, {max(available, 0)} available"
+        folder_reserved = self._folder_reserved.get(folder, 0)
+        if quota and used + folder_reserved + size > quota:
+            return f"Folder quota of {quota} bytes for {folder} exhausted"
+        self._device_reserved[device] = self._device_reserved.get(device, 0) + size
+        self._folder_reserved[folder] = folder_reserved + size
+        return None
+
+    def release(self, folder: str, size: int):
+        folder = os.path.abspath(folder)
+        device = self._devices.get(folder)
+        if device in self._device_reserved:
+            self._device_reserved[device] -= size
+        if folder in self._folder_reserved:
+            self._folder_reserved[folder] -= size
+
+    def status(self, folder: Optional[str] = None) -> dict:
+        folders = [os.path.abspath(folder)] if folder else sorted(set(self._folder_reserved) | set(self.quotas))
+        result = {"headroom": self.headroom, "default_quota": self.default_quota, "folders": {}}
+        for path in folders:
+            existing = existing_parent(path)
+            result["folders"][path] = {
+                "free": shutil.disk_usage(existing).free,
+                "reserved": self._folder_reserved.get(path, 0),
+                "quota": self.quota(path),
+                "used": folder_usage(path)
+            }
+        return result
+
+# Post-processing
+class PostProcessingPool:
+    """Runs post-processing on worker processes so CPU-heavy work never holds a transfer slot"""
+
+    def __init__(self, worker_count: int):
+        self.worker_count = worker_count
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _create_executor(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.worker_count, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def start(self):
+        self._create_executor()
+
+    async def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, task: dict) -> dict:
         try:
-            creds = await self.credential_manager.get(client_id)
-            if not creds:
-                logger.debug(f"No credentials found for client_id: {client_id}")
-                return None
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run_postprocess, task)
+        except BrokenProcessPool:
+            logger.error("Post-processing worker process exited unexpectedly, restarting the pool")
+            self._create_executor()
+            raise
 
-            # Check if credentials need refresh
-            if not creds.valid:
-                logger.debug(f"Credentials invalid for client_id: {client_id}, attempting refresh")
-                if client_id not in self._refresh_locks:
-                    self._refresh_locks[client_id] = asyncio.Lock()
-                
-                async with self._refresh_locks[client_id]:
-                    try:
-                        if creds.expired and creds.refresh_token:
-                            request = GoogleRequest()
-                            creds.refresh(request)
-                            await self.credential_manager.store(client_id, creds)
-                            logger.debug(f"Successfully refreshed credentials for client_id: {client_id}")
-                    except Exception as e:
-                        logger.error(f"Failed to refresh credentials: {e}")
-                        await self.credential_manager.remove(client_id)
-                        return None
+def create_download_engine(name: str, worker_count: int, metadata_worker_count: int):
+    if name == "process":
+        return ProcessDownloadEngine(worker_count, metadata_worker_count)
+    if name != "thread":
+        logger.warning(f"Unknown download engine {name}, falling back to thread engine")
+    return ThreadDownloadEngine(worker_count, metadata_worker_count)
 
-            return creds
-        except Exception as e:
-            logger.error(f"Error in get_valid_credentials: {e}")
-            return None
+# Startup warm-up
+def warm_yt_dlp():
+    # Loads the extractors and probes ffmpeg, as the first real download would
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}):
+        pass
+
+def warm_google_auth():
+    google_jwt.load()
+    importlib.import_module("google.auth.transport.requests")
+    importlib.import_module("google_auth_oauthlib.flow")
+
+WARMUP_STEPS = [("yt_dlp", warm_yt_dlp), ("google_auth", warm_google_auth)]
+
+class Warmup:
+    """Runs the warm-up steps, in the background when FAST_START is set"""
+
+    def __init__(self, steps: List[tuple], fast_start: bool):
+        self.steps = steps
+        self.fast_start = fast_start
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.fast_start:
+            self._task = asyncio.create_task(self._run())
+        else:
+            await self._run()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        self.state = "warming"
+        loop = asyncio.get_running_loop()
+        for name, step in self.steps:
+            started = time.monotonic()
+            try:
+                await loop.run_in_executor(None, step)
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{name}: {e}"
+                logger.error(f"Warm-up step {name} failed: {e}")
+                return
+            self.timings[name] = round(time.monotonic() - started, 3)
+        self.state = "ready"
+        logger.info(f"Warm-up finished in {time.monotonic() - self.started_at:.2f}s: {self.timings}")
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "fast_start": self.fast_start,
+            "uptime": round(time.monotonic() - self.started_at, 3),
+            "steps": self.timings,
+            "error": self.error
+        }
 
 # Initialize managers
+metrics = create_metrics()
+loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL)
+warmup = Warmup(WARMUP_STEPS, FAST_START)
 manager = WebSocketManager()
-credential_manager = CredentialManager()
-auth_manager = AuthManager()
+progress_bus = ProgressBus(manager, PROGRESS_INTERVAL)
+state_backend = create_state_backend(STATE_BACKEND)
+auth_manager = AuthManager(state_backend)
+credential_manager = auth_manager.credential_manager
+youtube_api = YouTubeApiClient(YOUTUBE_API_ENDPOINT, API_CONNECTION_LIMIT, API_DAILY_QUOTA)
+google_certs = GoogleCertCache(GOOGLE_CERTS_URL)
+profile_cache = ProfileCache(PROFILE_CACHE_TTL)
+api_cache = ApiResponseCache(API_CACHE_SIZE, API_CACHE_TTLS)
+download_archive = DownloadArchive(ARCHIVE_PATH)
+job_journal = JobJournal(JOURNAL_PATH, JOURNAL_PROGRESS_INTERVAL, JOURNAL_OWNER, JOURNAL_OWNER_TIMEOUT)
+job_manager = JobManager(
+    DOWNLOAD_MAX_WORKERS, download_archive, job_journal, METADATA_WORKERS, TRANSFER_QUEUE_SIZE, CLIENT_CONCURRENCY
+)
+circuit_breakers = CircuitBreakers(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+# Transfers start at the configured worker count; throttling halves the limit and rising throughput
+# grows it up to the spawned DOWNLOAD_MAX_WORKERS
+transfer_limiter = AdaptiveLimiter("transfer", DOWNLOAD_WORKERS, 1, DOWNLOAD_MAX_WORKERS, ADAPT_INTERVAL)
+api_limiter = AdaptiveLimiter("api", max(1, API_CONCURRENCY // 2), 1, API_CONCURRENCY, ADAPT_INTERVAL)
+bandwidth_governor = BandwidthGovernor(BANDWIDTH_LIMIT, CLIENT_BANDWIDTH_LIMIT, JOB_BANDWIDTH_LIMIT)
+disk_space = DiskSpaceManager(DISK_HEADROOM, FOLDER_QUOTA)
+download_engine = create_download_engine(DOWNLOAD_ENGINE, DOWNLOAD_MAX_WORKERS, METADATA_WORKERS)
+postprocessing_pool = PostProcessingPool(POSTPROCESS_WORKERS)
+subscription_syncer = SubscriptionSyncer(SyncStore(SYNC_PATH), SYNC_CHECK_INTERVAL)
 
 # Helper functions
+def handle_shared_message(channel: str, message: dict):
+    """Deliver messages published by other workers through the state backend"""
+    if message.get("origin") == NODE_ID:
+        return
+    if channel == "progress":
+        client_id = message["client_id"]
+        if client_id in manager.active_connections:
+            asyncio.create_task(manager.broadcast_to_client(client_id, message["frame"]))
+    elif channel == "control":
+        job_manager.apply_control(message)
+
+async def shared_job(client_id: str, job_id: str) -> dict:
+    """Snapshot of a job running on another worker"""
+    shared = await state_backend.get_job(job_id)
+    if not shared or shared[0] != client_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return shared[1]
+
+def shared_item(snapshot: dict, item_id: str) -> dict:
+    for item in snapshot.get("items", []):
+        if item["item_id"] == item_id:
+            return item
+    raise HTTPException(status_code=404, detail="Item not found")
+
 def get_flow():
+    from google_auth_oauthlib.flow import Flow
     try:
         return Flow.from_client_secrets_file(
             CLIENT_SECRETS_FILE,
@@ -282,88 +3466,354 @@ async def get_credentials(request: Request) -> Credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return creds
 
-async def download_video(url: str, folder: str, video_id: str, client_id: str):
+async def download_video(
+    url: str,
+    folder: str,
+    video_id: str,
+    client_id: str,
+    job_id: Optional[str] = None,
+    is_cancelled=None,
+    format_spec: str = "best",
+    info: Optional[dict] = None
+) -> dict:
+    """Transfer a video's streams; merging and other post-processing are left to the caller"""
     try:
-        progress_manager = ProgressManager(manager, client_id, video_id)
-        
-        ydl_opts = {
-            'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
-            'format': 'best',
-            'progress_hooks': [progress_manager.create_hook()],
-            'quiet': True,
-            'no_warnings': True,
-            'noprogress': False
+        progress_manager = ProgressManager(
+            progress_bus, client_id, video_id, job_id, is_cancelled, journal=job_journal
+        )
+        task = {
+            'task_id': f"{job_id}:{video_id}",
+            'url': url,
+            'folder': folder,
+            'format': format_spec,
+            'preallocate': DISK_PREALLOCATE,
+            'info': info
         }
-        
-        def download():
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-        
-        await asyncio.get_event_loop().run_in_executor(None, download)
-        
+        share = bandwidth_governor.register(task['task_id'], job_id, client_id)
+        progress_manager.bandwidth_share = share
+        progress_manager.limiter = transfer_limiter
+        try:
+            return await download_engine.download(task, progress_manager.create_hook(), share)
+        finally:
+            bandwidth_governor.unregister(share)
+
     except Exception as e:
         logger.error(f"Download error for {video_id}: {e}")
-        await manager.broadcast_to_client(
-            client_id,
-            json.dumps({
-                'video_id': video_id,
-                'status': 'error',
-                'error': str(e)
-            })
+        progress_bus.publish(client_id, {
+            'job_id': job_id,
+            'video_id': video_id,
+            'status': 'error',
+            'error': str(e)
+        })
+        raise
+
+async def extract_video_info(
+    url: str,
+    folder: str,
+    video_id: str,
+    client_id: str,
+    job_id: Optional[str] = None,
+    format_spec: str = "best"
+) -> dict:
+    try:
+        return await download_engine.extract({
+            'task_id': f"{job_id}:{video_id}",
+            'url': url,
+            'folder': folder,
+            'format': format_spec
+        })
+    except Exception as e:
+        logger.error(f"Metadata extraction error for {video_id}: {e}")
+        progress_bus.publish(client_id, {
+            'job_id': job_id,
+            'video_id': video_id,
+            'status': 'error',
+            'error': str(e)
+        })
+        raise
+
+def watch_url(video_id: str) -> str:
+    return WATCH_URL_TEMPLATE.format(video_id=video_id)
+
+async def execute_cached(endpoint: str, params: dict, credentials: Credentials, cache_key: tuple) -> dict:
+    """Execute an API request through the response cache, revalidating stale entries by ETag"""
+    cached = api_cache.get(cache_key)
+    if cached and cached[1]:
+        api_cache.hits += 1
+        return cached[0]
+
+    api_cache.misses += 1
+    etag = cached[0].get("etag") if cached else None
+    response = await execute_api_request(endpoint, params, credentials, etag)
+    if response is None:
+        api_cache.revalidations += 1
+        api_cache.put(cache_key, cached[0])
+        return cached[0]
+
+    api_cache.put(cache_key, response)
+    return response
+
+async def execute_api_request(
+    endpoint: str,
+    params: dict,
+    credentials: Credentials,
+    etag: Optional[str] = None
+) -> Optional[dict]:
+    """Execute an API request under the adaptive API limit, retrying throttling with backoff"""
+    breaker = circuit_breakers.get(f"api:{endpoint}")
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            async with api_limiter:
+                started = time.monotonic()
+                try:
+                    response = await youtube_api.get(endpoint, params, credentials, etag)
+                finally:
+                    metrics.observe("ytdl_api_request_duration_seconds", time.monotonic() - started, endpoint=endpoint)
+        except Exception as e:
+            if not is_retryable_error(e):
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if is_throttle_error(e):
+                api_limiter.record_throttle()
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            logger.warning(f"YouTube API {endpoint} call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        api_limiter.record_units(1)
+        return response
+
+async def paginate(
+    credentials: Credentials,
+    endpoint: str,
+    params: dict,
+    extract_urls,
+    max_results: int,
+    cache_key: tuple
+):
+    """Yield pages of video URLs, following nextPageToken until max_results are found"""
+    page_token = None
+    remaining = max_results
+    while remaining > 0:
+        # Always request full pages so differently sized batches share cache entries
+        response = await execute_cached(
+            endpoint,
+            dict(params, maxResults=YOUTUBE_PAGE_SIZE, pageToken=page_token),
+            credentials,
+            cache_key + (page_token,)
         )
+        urls = extract_urls(response)[:remaining]
+        remaining -= len(urls)
+        yield urls
 
-async def fetch_search_videos(youtube, query, category, max_results):
-    search_response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: youtube.search().list(
-            part="id,snippet",
-            q=query,
-            type="video",
-            maxResults=max_results,
-            videoCategoryId=category if category else None
-        ).execute()
-    )
-    return [
-        f"https://www.youtube.com/watch?v={item['id']['videoId']}" 
-        for item in search_response.get('items', [])
-    ]
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+async def fetch_search_videos(credentials, client_id, query, category, max_results):
+    async for urls in paginate(
+        credentials,
+        "search",
+        {"part": "id", "q": query, "type": "video", "videoCategoryId": category or None},
+        lambda response: [
+            watch_url(item['id']['videoId'])
+            for item in response.get('items', [])
+        ],
+        max_results,
+        # Search results are shared across users
+        ("search", "shared", query, category)
+    ):
+        yield urls
 
-async def fetch_watch_later_videos(youtube, max_results):
+async def fetch_watch_later_videos(credentials, client_id, max_results):
     try:
-        playlist_response = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: youtube.playlistItems().list(
-                part="contentDetails",
-                playlistId="WL",
-                maxResults=max_results
-            ).execute()
-        )
-        return [
-            f"https://www.youtube.com/watch?v={item['contentDetails']['videoId']}" 
-            for item in playlist_response.get('items', [])
-        ]
-    except HttpError as e:
-        if e.resp.status == 404:
+        async for urls in paginate(
+            credentials,
+            "playlistItems",
+            {"part": "contentDetails", "playlistId": "WL"},
+            lambda response: [
+                watch_url(item['contentDetails']['videoId'])
+                for item in response.get('items', [])
+            ],
+            max_results,
+            ("playlistItems", client_id, "WL")
+        ):
+            yield urls
+    except YouTubeApiError as e:
+        if e.status == 404:
             logger.warning("Watch Later playlist not found or empty")
-            return []
+            return
         raise
 
-async def fetch_unwatched_videos(youtube, max_results):
-    activities_response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: youtube.activities().list(
-            part="contentDetails",
-            home=True,
-            maxResults=max_results
-        ).execute()
-    )
-    return [
-        f"https://www.youtube.com/watch?v={item['contentDetails']['upload']['videoId']}" 
-        for item in activities_response.get('items', [])
-        if 'upload' in item.get('contentDetails', {})
-    ]
+async def fetch_unwatched_videos(credentials, client_id, max_results):
+    async for urls in paginate(
+        credentials,
+        "activities",
+        {"part": "contentDetails", "home": True},
+        lambda response: [
+            watch_url(item['contentDetails']['upload']['videoId'])
+            for item in response.get('items', [])
+            if 'upload' in item.get('contentDetails', {})
+        ],
+        max_results,
+        ("activities", client_id, "home")
+    ):
+        yield urls
+
+def published_at(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+async def fetch_new_uploads(credentials, client_id, published_after, max_results):
+    """Yield (url, publishedAt) of home feed uploads newer than published_after"""
+    after = published_at(published_after) if published_after else None
+    async for uploads in paginate(
+        credentials,
+        "activities",
+        {"part": "snippet,contentDetails", "home": True, "publishedAfter": published_after},
+        lambda response: [
+            (watch_url(item['contentDetails']['upload']['videoId']), item['snippet']['publishedAt'])
+            for item in response.get('items', [])
+            if 'upload' in item.get('contentDetails', {})
+            and (after is None or published_at(item['snippet']['publishedAt']) > after)
+        ],
+        max_results,
+        # Unchanged feeds keep the same request, so polls revalidate by ETag
+        ("activities", client_id, "sync", published_after)
+    ):
+        yield uploads
+
+async def fetch_video_details(credentials: Credentials, video_ids: List[str]) -> Dict[str, dict]:
+    """Look up snippet, contentDetails and statistics with one videos().list call per 50 IDs"""
+    batches = [video_ids[start:start + YOUTUBE_PAGE_SIZE] for start in range(0, len(video_ids), YOUTUBE_PAGE_SIZE)]
+    responses = await asyncio.gather(*(
+        execute_cached(
+            "videos",
+            {"part": "snippet,contentDetails,statistics", "id": ",".join(batch), "maxResults": YOUTUBE_PAGE_SIZE},
+            credentials,
+            # Video details are the same for every user
+            ("videos", "shared", tuple(batch))
+        )
+        for batch in batches
+    ))
+    return {video["id"]: video for response in responses for video in response.get("items", [])}
+
+def request_priority(requested: Optional[str], total_videos: int) -> str:
+    """Scheduling priority of a request; interactive is reserved for requests of at most INTERACTIVE_MAX_VIDEOS"""
+    if total_videos > INTERACTIVE_MAX_VIDEOS and requested in (None, "interactive"):
+        return "normal"
+    return requested or "interactive"
+
+def build_sources(
+    client_id: str,
+    credentials: Credentials,
+    download_request: DownloadRequest
+) -> Dict[str, object]:
+    """Create one page iterator per selected video source"""
+    sources = {}
+    if download_request.query:
+        sources["search"] = fetch_search_videos(
+            credentials,
+            client_id,
+            download_request.query,
+            download_request.category,
+            download_request.numVideos
+        )
+    if download_request.useWatchLater:
+        sources["watch_later"] = fetch_watch_later_videos(
+            credentials, client_id, download_request.numVideos
+        )
+    if download_request.useUnwatched:
+        sources["unwatched"] = fetch_unwatched_videos(
+            credentials, client_id, download_request.numVideos
+        )
+    return sources
+
+# Lifecycle
+@app.on_event("startup")
+async def startup():
+    await loop_monitor.start()
+    await warmup.start()
+    await state_backend.start(handle_shared_message)
+    await auth_manager.start()
+    await progress_bus.start()
+    await transfer_limiter.start()
+    await api_limiter.start()
+    await youtube_api.start()
+    await google_certs.start()
+    await download_engine.start()
+    await postprocessing_pool.start()
+    await job_manager.start()
+    if job_manager.primary:
+        await subscription_syncer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await subscription_syncer.stop()
+    await job_manager.stop()
+    await postprocessing_pool.stop()
+    await download_engine.stop()
+    await transfer_limiter.stop()
+    await api_limiter.stop()
+    await youtube_api.stop()
+    await google_certs.stop()
+    await progress_bus.stop()
+    await auth_manager.stop()
+    await state_backend.stop()
+    await warmup.stop()
+    await loop_monitor.stop()
 
 # Routes
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "uptime": round(time.monotonic() - warmup.started_at, 3)}
+
+@app.get("/readyz")
+async def readyz():
+    status = warmup.status()
+    # Serving works before warm-up finishes, but the first download pays for the imports
+    return JSONResponse(status_code=200 if warmup.ready else 503, content=status)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    stages = job_manager.stats()
+    cache = api_cache.stats()
+    saturation = download_engine.saturation()
+    job_speeds = progress_bus.job_speeds()
+    quota = youtube_api.quota()
+    gauges = [
+        ("ytdl_queue_depth", "Videos waiting per pipeline stage", {
+            (("stage", stage),): stats["queue_depth"] for stage, stats in stages.items()
+        }),
+        ("ytdl_active_videos", "Videos being processed per pipeline stage", {
+            (("stage", stage),): stats["active"] for stage, stats in stages.items()
+        }),
+        ("ytdl_job_bytes_per_second", "Current transfer rate per job", {
+            (("job_id", job_id),): speed for job_id, speed in job_speeds.items() if speed
+        }),
+        ("ytdl_bytes_per_second", "Current transfer rate across all jobs", {(): sum(job_speeds.values())}),
+        ("ytdl_api_cache_hit_ratio", "YouTube API response cache hit ratio", {(): cache["hit_rate"]}),
+        ("ytdl_api_cache_entries", "Cached YouTube API responses", {(): cache["entries"]}),
+        ("ytdl_api_quota_remaining", "YouTube Data API quota units left today", {(): quota["remaining"]}),
+        ("ytdl_concurrency_limit", "Adaptive concurrency limit", {
+            (("limiter", "transfer"),): int(transfer_limiter.limit),
+            (("limiter", "api"),): int(api_limiter.limit)
+        }),
+        ("ytdl_event_loop_lag_current_seconds", "Most recent event loop lag sample", {(): loop_monitor.lag}),
+        ("ytdl_executor_busy", "Busy download engine workers", {(): saturation["busy"]}),
+        ("ytdl_executor_capacity", "Download engine workers", {(): saturation["capacity"]})
+    ]
+    return Response(
+        content=metrics.render(gauges),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/")
 async def root():
     return {"message": "YouTube Downloader API is running"}
@@ -423,6 +3873,7 @@ async def auth_callback(
         credentials = flow.credentials
         
         await credential_manager.store(client_id, credentials)
+        profile_cache.invalidate(client_id)
         
         response = JSONResponse(
             content={"status": "success", "message": "Authentication successful"}
@@ -473,49 +3924,65 @@ async def auth_check(request: Request):
             content={"status": "error", "message": str(e)}
         )
 
+@app.post("/auth/logout")
+async def auth_logout(request: Request):
+    client_id = request.cookies.get("client_id")
+    if client_id:
+        await credential_manager.remove(client_id)
+        api_cache.invalidate_scope(client_id)
+        profile_cache.invalidate(client_id)
+
+    response = JSONResponse(content={"status": "success", "message": "Logged out"})
+    response.delete_cookie(key="client_id", path="/", domain="localhost")
+    return response
+
 @app.get("/user/profile")
 async def get_user_profile(request: Request, credentials: Credentials = Depends(get_credentials)):
+    client_id = request.cookies.get("client_id")
+    profile = profile_cache.get(client_id)
+    if profile:
+        metrics.inc("ytdl_profile_requests_total", source="cache")
+        return profile
+
     try:
-        userinfo_request = requests.Request()
-        
+        profile = None
         try:
             if credentials.id_token:
-                id_info = id_token.verify_oauth2_token(
-                    credentials.id_token,
-                    userinfo_request,
-                    credentials.client_id
-                )
-                return {
+                id_info = await google_certs.verify(credentials.id_token, credentials.client_id)
+                profile = {
                     "name": id_info.get("name", "Unknown User"),
                     "picture": id_info.get("picture", ""),
                     "email": id_info.get("email", "")
                 }
+                metrics.inc("ytdl_profile_requests_total", source="id_token")
         except Exception as e:
             logger.warning(f"Could not get profile from id_token: {e}")
-        
-        youtube = googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
-        channels_response = youtube.channels().list(
-            part="snippet",
-            mine=True
-        ).execute()
-        
-        if channels_response["items"]:
-            channel = channels_response["items"][0]["snippet"]
-            return {
-                "name": channel.get("title", "Unknown User"),
-                "picture": channel.get("thumbnails", {}).get("default", {}).get("url", ""),
-                "email": ""
-            }
-        
-        return {"name": "Unknown User", "picture": "", "email": ""}
-            
+
+        if profile is None:
+            channels_response = await execute_api_request(
+                "channels", {"part": "snippet", "mine": True}, credentials
+            )
+            metrics.inc("ytdl_profile_requests_total", source="channels")
+            if channels_response.get("items"):
+                channel = channels_response["items"][0]["snippet"]
+                profile = {
+                    "name": channel.get("title", "Unknown User"),
+                    "picture": channel.get("thumbnails", {}).get("default", {}).get("url", ""),
+                    "email": ""
+                }
+            else:
+                profile = {"name": "Unknown User", "picture": "", "email": ""}
+
+        profile_cache.put(client_id, profile)
+        return profile
+
     except Exception as e:
         logger.error(f"Profile fetch error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.websocket("/progress")
-async def websocket_endpoint(websocket: WebSocket, request: Request):
-    client_id = request.cookies.get("client_id")
+async def websocket_endpoint(websocket: WebSocket):
+    client_id = websocket.cookies.get("client_id")
     if not client_id:
         await websocket.close(code=1008, reason="No client ID found")
         return
@@ -540,76 +4007,242 @@ async def start_download(
     client_id = request.cookies.get("client_id")
     if not client_id:
         raise HTTPException(status_code=401, detail="No client ID found")
+    if download_request.quality not in QUALITY_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown quality profile: {download_request.quality}")
+    if download_request.oversize not in OVERSIZE_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown oversize action: {download_request.oversize}")
+    sources = build_sources(client_id, credentials, download_request)
+    # numVideos applies to each source
+    priority = request_priority(download_request.priority, download_request.numVideos * len(sources))
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {priority}")
+    unknown_steps = set(download_request.postprocess) - set(POSTPROCESS_STEPS)
+    if unknown_steps:
+        raise HTTPException(status_code=400, detail=f"Unknown post-processing steps: {sorted(unknown_steps)}")
+    if download_request.remuxFormat not in REMUX_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown remux format: {download_request.remuxFormat}")
 
     try:
         os.makedirs(download_request.folder, exist_ok=True)
-        
-        youtube = googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
-        video_urls = []
-
-        if download_request.query:
-            search_response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: youtube.search().list(
-                    part="id,snippet",
-                    q=download_request.query,
-                    type="video",
-                    maxResults=download_request.numVideos,
-                    videoCategoryId=download_request.category if download_request.category else None
-                ).execute()
-            )
-            video_urls.extend([
-                f"https://www.youtube.com/watch?v={item['id']['videoId']}" 
-                for item in search_response.get('items', [])
-            ])
-
-        if download_request.useWatchLater:
-            playlist_response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: youtube.playlistItems().list(
-                    part="contentDetails",
-                    playlistId="WL",
-                    maxResults=download_request.numVideos
-                ).execute()
-            )
-            video_urls.extend([
-                f"https://www.youtube.com/watch?v={item['contentDetails']['videoId']}" 
-                for item in playlist_response.get('items', [])
-            ])
-
-        if download_request.useUnwatched:
-            subscription_response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: youtube.activities().list(
-                    part="contentDetails",
-                    home=True,
-                    maxResults=download_request.numVideos
-                ).execute()
-            )
-            video_urls.extend([
-                f"https://www.youtube.com/watch?v={item['contentDetails']['upload']['videoId']}" 
-                for item in subscription_response.get('items', [])
-                if 'upload' in item.get('contentDetails', {})
-            ])
-
-        # Start downloads
-        tasks = []
-        for i, url in enumerate(video_urls):
-            video_id = f"video_{i+1}"
-            task = asyncio.create_task(
-                download_video(url, download_request.folder, video_id, client_id)
-            )
-            tasks.append(task)
 
-        # Wait for all downloads to complete
-        await asyncio.gather(*tasks)
+        job = job_manager.create_job(
+            client_id,
+            download_request.folder,
+            quality=download_request.quality,
+            max_bytes_per_video=download_request.maxBytesPerVideo,
+            max_total_bytes=download_request.maxTotalBytes,
+            oversize=download_request.oversize,
+            priority=priority,
+            postprocess=download_request.postprocess,
+            remux_format=download_request.remuxFormat,
+            filters={
+                "max_duration": download_request.maxDurationSeconds,
+                "min_duration": download_request.minDurationSeconds,
+                "min_views": download_request.minViews,
+                "exclude_live": download_request.excludeLive,
+                "exclude_age_restricted": download_request.excludeAgeRestricted
+            }
+        )
+        if download_request.bandwidthLimit is not None:
+            bandwidth_governor.set_limits(job_id=job.job_id, job_limit=download_request.bandwidthLimit)
+        job_manager.start_resolution(job, sources, partial(fetch_video_details, credentials))
 
-        return {"message": "Downloads completed", "total_videos": len(video_urls)}
+        return {
+            "message": "Download job queued",
+            "job_id": job.job_id,
+            "priority": priority
+        }
 
     except Exception as e:
         logger.error(f"Download start error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs")
+async def list_jobs(request: Request, credentials: Credentials = Depends(get_credentials)):
+    client_id = request.cookies.get("client_id")
+    jobs = [dict(job.to_dict(), **job_manager.queue_info(job)) for job in job_manager.list_jobs(client_id)]
+    # Jobs running on other workers
+    for snapshot in await state_backend.list_jobs(client_id):
+        if snapshot["job_id"] not in job_manager.jobs:
+            snapshot.pop("items", None)
+            jobs.append(snapshot)
+    return {"jobs": jobs}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request, credentials: Credentials = Depends(get_credentials)):
+    client_id = request.cookies.get("client_id")
+    if job_id not in job_manager.jobs:
+        return await shared_job(client_id, job_id)
+    job = job_manager.get_job(client_id, job_id)
+    return job_manager.describe_job(job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request, credentials: Credentials = Depends(get_credentials)):
+    client_id = request.cookies.get("client_id")
+    if job_id not in job_manager.jobs:
+        snapshot = await shared_job(client_id, job_id)
+        await state_backend.publish("control", {
+            "origin": NODE_ID, "action": "cancel_job", "client_id": client_id, "job_id": job_id
+        })
+        snapshot.pop("items", None)
+        return dict(snapshot, status="cancelling")
+    job = job_manager.get_job(client_id, job_id)
+    job_manager.cancel_job(job)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/items/{item_id}")
+async def get_job_item(
+    job_id: str,
+    item_id: str,
+    request: Request,
+    credentials: Credentials = Depends(get_credentials)
+):
+    client_id = request.cookies.get("client_id")
+    if job_id not in job_manager.jobs:
+        return shared_item(await shared_job(client_id, job_id), item_id)
+    job = job_manager.get_job(client_id, job_id)
+    item = job_manager.get_item(client_id, job_id, item_id)
+    return job_manager.describe_item(job, item)
+
+@app.delete("/jobs/{job_id}/items/{item_id}")
+async def cancel_job_item(
+    job_id: str,
+    item_id: str,
+    request: Request,
+    credentials: Credentials = Depends(get_credentials)
+):
+    client_id = request.cookies.get("client_id")
+    if job_id not in job_manager.jobs:
+        item = shared_item(await shared_job(client_id, job_id), item_id)
+        await state_backend.publish("control", {
+            "origin": NODE_ID, "action": "cancel_item", "client_id": client_id, "job_id": job_id, "item_id": item_id
+        })
+        return item
+    item = job_manager.get_item(client_id, job_id, item_id)
+    job_manager.cancel_item(item)
+    return item.to_dict()
+
+@app.get("/sync")
+async def get_sync(request: Request, credentials: Credentials = Depends(get_credentials)):
+    subscription = subscription_syncer.store.get(request.cookies.get("client_id"))
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Subscription sync not configured")
+    return subscription
+
+@app.put("/sync")
+async def set_sync(settings: SyncSettings, request: Request, credentials: Credentials = Depends(get_credentials)):
+    if settings.quality not in QUALITY_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown quality profile: {settings.quality}")
+    if settings.intervalSeconds < SYNC_MIN_INTERVAL:
+        raise HTTPException(status_code=400, detail=f"intervalSeconds must be at least {SYNC_MIN_INTERVAL}")
+    client_id = request.cookies.get("client_id")
+    subscription_syncer.store.upsert(client_id, settings)
+    return subscription_syncer.store.get(client_id)
+
+@app.delete("/sync")
+async def delete_sync(request: Request, credentials: Credentials = Depends(get_credentials)):
+    if not subscription_syncer.store.remove(request.cookies.get("client_id")):
+        raise HTTPException(status_code=404, detail="Subscription sync not configured")
+    return {"message": "Subscription sync removed"}
+
+@app.post("/sync/run")
+async def run_sync(request: Request, credentials: Credentials = Depends(get_credentials)):
+    subscription = subscription_syncer.store.get(request.cookies.get("client_id"))
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Subscription sync not configured")
+    return await subscription_syncer.sync(subscription)
+
+@app.get("/bandwidth")
+async def get_bandwidth(request: Request, credentials: Credentials = Depends(get_credentials)):
+    return bandwidth_governor.status(request.cookies.get("client_id"))
+
+@app.put("/bandwidth")
+async def set_bandwidth(
+    limits: BandwidthLimits,
+    request: Request,
+    credentials: Credentials = Depends(get_credentials)
+):
+    client_id = request.cookies.get("client_id")
+    if limits.globalLimit is not None:
+        raise HTTPException(status_code=403, detail="The global bandwidth limit is set with BANDWIDTH_LIMIT")
+    if limits.jobId and job_manager.get_job(client_id, limits.jobId).status in FINISHED_JOB_STATES:
+        raise HTTPException(status_code=409, detail="Job has already finished")
+    bandwidth_governor.set_limits(
+        client_id=client_id,
+        client_limit=limits.clientLimit,
+        job_id=limits.jobId,
+        job_limit=limits.jobLimit
+    )
+    return bandwidth_governor.status(client_id)
+
+@app.get("/disk")
+async def disk_status(folder: Optional[str] = None, credentials: Credentials = Depends(get_credentials)):
+    return await asyncio.get_running_loop().run_in_executor(None, disk_space.status, folder)
+
+@app.put("/disk/quota")
+async def set_folder_quota(quota: FolderQuota, credentials: Credentials = Depends(get_credentials)):
+    disk_space.set_quota(quota.folder, quota.quotaBytes)
+    return await asyncio.get_running_loop().run_in_executor(None, disk_space.status, quota.folder)
+
+@app.get("/quality-profiles")
+async def quality_profiles():
+    return {
+        name: dict(profile, format=profile_format(name, merge=shutil.which("ffmpeg") is not None))
+        for name, profile in QUALITY_PROFILES.items()
+    }
+
+@app.get("/pipeline/stats")
+async def pipeline_stats(credentials: Credentials = Depends(get_credentials)):
+    return job_manager.stats()
+
+@app.get("/concurrency")
+async def concurrency_status(credentials: Credentials = Depends(get_credentials)):
+    return {
+        "transfer": transfer_limiter.status(),
+        "api": api_limiter.status(),
+        "circuits": circuit_breakers.status()
+    }
+
+@app.get("/cache/stats")
+async def cache_stats(credentials: Credentials = Depends(get_credentials)):
+    return api_cache.stats()
+
+@app.get("/quota")
+async def quota_status(credentials: Credentials = Depends(get_credentials)):
+    return youtube_api.quota()
+
+@app.get("/archive")
+async def query_archive(
+    request: Request,
+    folder: Optional[str] = None,
+    video_id: Optional[str] = None,
+    limit: int = 100,
+    credentials: Credentials = Depends(get_credentials)
+):
+    return {"entries": download_archive.query(request.cookies.get("client_id"), folder, video_id, limit)}
+
+@app.delete("/archive")
+async def prune_archive(
+    request: Request,
+    folder: Optional[str] = None,
+    video_id: Optional[str] = None,
+    older_than_days: Optional[int] = None,
+    missing_only: bool = False,
+    all_entries: bool = Query(False, alias="all"),
+    credentials: Credentials = Depends(get_credentials)
+):
+    if not (folder or video_id or older_than_days is not None or missing_only or all_entries):
+        raise HTTPException(status_code=400, detail="Pass a filter, or all=true to remove every entry")
+    older_than = datetime.now() - timedelta(days=older_than_days) if older_than_days is not None else None
+    removed = await asyncio.get_running_loop().run_in_executor(
+        None,
+        partial(download_archive.prune, request.cookies.get("client_id"), folder, video_id, older_than, missing_only)
+    )
+    return {"removed": removed}
+
 if __name__ == "__main__":
     import uvicorn
+    # Spawned pool and worker processes would otherwise re-run this script, with all its
+    # module-level setup, before loading their side-effect-free worker module
+    sys.modules["__main__"].__spec__ = importlib.util.spec_from_loader("__main__", loader=None)
     uvicorn.run(app, host="0.0.0.0", port=8000)
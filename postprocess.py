@@ -0,0 +1,147 @@
+"""Post-processing of downloaded files: merging, conversion, tagging and checksums.
+
+Runs on the post-processing pool's worker processes, so importing this module must stay free of side effects.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+import urllib.request
+from typing import Dict, List
+
+AUDIO_EXTENSIONS = {"mp4a": "m4a", "opus": "opus", "vorbis": "ogg", "mp3": "mp3", "flac": "flac"}
+THUMBNAIL_CONTAINERS = ("mp4", "m4a", "mov")  # Containers that take an embedded cover image
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def move_into_place(path: str, home: str) -> str:
+    """Move a finished file out of the staging directory; a rename, since both are on one filesystem"""
+    target = os.path.join(home, os.path.basename(path))
+    if os.path.abspath(path) != os.path.abspath(target):
+        os.replace(path, target)
+    return target
+
+def run_ffmpeg(ffmpeg: str, inputs: List[str], output: str, args: List[str]):
+    """Run ffmpeg into a temporary file and move it over output once it succeeds"""
+    base, ext = os.path.splitext(output)
+    temp = f"{base}.temp{ext}"
+    command = [ffmpeg, "-y", "-loglevel", "error"]
+    for path in inputs:
+        command += ["-i", path]
+    result = subprocess.run(command + args + [temp], capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+    os.replace(temp, output)
+
+def merge_streams(ffmpeg: str, parts: List[str], filepath: str, task: dict) -> str:
+    maps = []
+    for index in range(len(parts)):
+        maps += ["-map", str(index)]
+    run_ffmpeg(ffmpeg, parts, filepath, maps + ["-c", "copy"])
+    for part in parts:
+        if part != filepath:
+            os.remove(part)
+    return filepath
+
+def remux(ffmpeg: str, filepath: str, task: dict) -> str:
+    output = f"{os.path.splitext(filepath)[0]}.{task['remux_format']}"
+    if output == filepath:
+        return filepath
+    run_ffmpeg(ffmpeg, [filepath], output, ["-map", "0", "-c", "copy"])
+    os.remove(filepath)
+    return output
+
+def extract_audio(ffmpeg: str, filepath: str, task: dict) -> str:
+    acodec = (task['metadata'].get('acodec') or "").split(".")[0]
+    output = f"{os.path.splitext(filepath)[0]}.{AUDIO_EXTENSIONS.get(acodec, 'mka')}"
+    if output == filepath:
+        return filepath
+    run_ffmpeg(ffmpeg, [filepath], output, ["-vn", "-map", "0:a", "-c:a", "copy"])
+    os.remove(filepath)
+    return output
+
+def embed_thumbnail(ffmpeg: str, filepath: str, task: dict) -> str:
+    url = task['metadata'].get('thumbnail')
+    if not url:
+        raise ValueError("no thumbnail available")
+    thumbnail = f"{os.path.splitext(filepath)[0]}.jpg"
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response, open(thumbnail, "wb") as f:
+            shutil.copyfileobj(response, f)
+    except OSError:
+        if os.path.exists(thumbnail):
+            os.remove(thumbnail)
+        raise
+    if os.path.splitext(filepath)[1].lstrip(".") not in THUMBNAIL_CONTAINERS:
+        raise ValueError(f"thumbnail saved to {thumbnail}; the container cannot embed it")
+    try:
+        # The cover goes first so it is output stream 0, whatever the media file contains
+        run_ffmpeg(ffmpeg, [thumbnail, filepath], filepath, [
+            "-map", "1", "-map", "0", "-c", "copy", "-disposition:0", "attached_pic"
+        ])
+    finally:
+        os.remove(thumbnail)
+    return filepath
+
+def tag_metadata(ffmpeg: str, filepath: str, task: dict) -> str:
+    metadata = task['metadata']
+    upload_date = metadata.get('upload_date') or ""
+    tags = {
+        "title": metadata.get('title'),
+        "artist": metadata.get('uploader'),
+        "date": f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}" if len(upload_date) == 8 else None,
+        "comment": metadata.get('webpage_url')
+    }
+    args = ["-map", "0", "-c", "copy"]
+    for key, value in tags.items():
+        if value:
+            args += ["-metadata", f"{key}={value}"]
+    run_ffmpeg(ffmpeg, [filepath], filepath, args)
+    return filepath
+
+POSTPROCESSORS = {
+    "remux": remux,
+    "extract_audio": extract_audio,
+    "thumbnail": embed_thumbnail,
+    "metadata": tag_metadata
+}
+
+def run_postprocess(task: dict) -> dict:
+    """Merge, convert and checksum a downloaded file; runs on the post-processing pool"""
+    ffmpeg = shutil.which("ffmpeg")
+    filepath = task['filepath']
+    timings: Dict[str, float] = {}
+    notes: List[str] = []
+
+    def timed(step: str, func, *args):
+        started = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            timings[step] = time.monotonic() - started
+
+    # Formats with separate streams are only selected when ffmpeg is installed
+    if len(task['parts']) > 1:
+        filepath = timed("merge", merge_streams, ffmpeg, task['parts'], filepath, task)
+    for step in task['steps']:
+        if not ffmpeg:
+            notes.append(f"{step}: ffmpeg not found")
+            continue
+        # Optional steps never fail the item: ffmpeg errors (RuntimeError) and failed
+        # thumbnail fetches (URLError, an OSError) leave the file as it was
+        try:
+            filepath = timed(step, POSTPROCESSORS[step], ffmpeg, filepath, task)
+        except (ValueError, RuntimeError, OSError) as e:
+            notes.append(f"{step}: {e}")
+    if task.get('home'):
+        filepath = timed("move", move_into_place, filepath, task['home'])
+    checksum = timed("checksum", file_checksum, filepath)
+    return {'filepath': filepath, 'checksum': checksum, 'timings': timings, 'notes': notes}
@@ -3,7 +3,7 @@ let isWebSocketConnected = false;
 let reconnectAttempts = 0;
 const MAX_RECONNECT_ATTEMPTS = 5;
 const RECONNECT_INTERVAL = 5000;
-const MAX_VIDEOS = 50;
+const MAX_VIDEOS = 500;
 let reconnectTimeout = null;
 let authCheckInterval = null;
 
@@ -12,6 +12,7 @@ function initializeUI() {
     const controls = [
         "query",
         "category",
+        "quality",
         "numVideos",
         "useRecommended",
         "useWatchLater",
@@ -135,33 +136,40 @@ function validateDownloadParams(formData) {
     return true;
 }
 
-// Function to update progress UI
-function updateProgress(progress) {
+// Function to update progress UI from a batched progress frame
+function updateProgress(frame) {
     const progressBar = document.getElementById("progressBar");
     const progressText = document.getElementById("progressText");
-    
-    if (progress.status === "downloading") {
-        const percent = progress.progress.toFixed(1);
+
+    const failed = [...frame.items, ...frame.errors].filter(item => item.status === "error");
+    if (failed.length > 0) {
+        showError(failed[failed.length - 1].error);
+    }
+
+    frame.jobs.forEach(job => {
+        const percent = job.progress.toFixed(1);
         progressBar.style.width = `${percent}%`;
         progressText.innerText = `${percent}%`;
-        
-        let statusText = `Downloading video ${progress.video_id}...`;
-        if (progress.speed) {
-            const speed = (progress.speed / 1024 / 1024).toFixed(2);
-            statusText += ` Speed: ${speed} MB/s`;
-        }
-        if (progress.eta) {
-            statusText += ` ETA: ${progress.eta}s`;
+
+        const active = frame.items.filter(item => item.job_id === job.job_id && item.status === "downloading");
+        if (job.status === "completed") {
+            showSuccess('Download Complete!');
+        } else if (job.status === "completed_with_errors") {
+            showError("Download finished with errors");
+        } else if (job.status === "cancelled") {
+            document.getElementById("status").innerText = "Status: Download cancelled";
+        } else if (active.length > 0) {
+            let statusText = `Downloading ${active.length} video(s)...`;
+            if (job.speed) {
+                const speed = (job.speed / 1024 / 1024).toFixed(2);
+                statusText += ` Speed: ${speed} MB/s`;
+            }
+            if (job.eta) {
+                statusText += ` ETA: ${Math.round(job.eta)}s`;
+            }
+            document.getElementById("status").innerText = `Status: ${statusText}`;
         }
-        
-        document.getElementById("status").innerText = `Status: ${statusText}`;
-    } else if (progress.status === "finished") {
-        progressBar.style.width = "100%";
-        progressText.innerText = "100%";
-        showSuccess('Download Complete!');
-    } else if (progress.status === "error") {
-        showError(progress.error);
-    }
+    });
 }
 
 // Event Listeners
@@ -237,6 +245,7 @@ document.getElementById("startDownload").addEventListener("click", async () => {
     const formData = {
         query: document.getElementById("query").value.trim(),
         category: document.getElementById("category").value,
+        quality: document.getElementById("quality").value,
         numVideos: parseInt(document.getElementById("numVideos").value),
         folder: document.getElementById("folderPath").innerText,
         useRecommended: document.getElementById("useRecommended").checked,
@@ -0,0 +1,22 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    """Import main.py with its SQLite stores in a temporary directory"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("google.oauth2.credentials")
+    monkeypatch.chdir(tmp_path)
+    for name in ("ARCHIVE_PATH", "JOURNAL_PATH", "STATE_PATH", "SYNC_PATH"):
+        monkeypatch.setenv(name, str(tmp_path / f"{name.lower()}.sqlite3"))
+    monkeypatch.syspath_prepend(ROOT)
+    sys.modules.pop("main", None)
+    module = importlib.import_module("main")
+    yield module
+    sys.modules.pop("main", None)
@@ -0,0 +1,44 @@
+import asyncio
+
+def test_cache_serves_fresh_entries_within_their_ttl(main_module):
+    cache = main_module.ApiResponseCache(8, {"search": 0}, default_ttl=60)
+    assert cache.get(("videos", "client", "a")) is None
+    cache.put(("videos", "client", "a"), {"items": [1]})
+    cache.put(("search", "client", "q"), {"items": [2]})
+    assert cache.get(("videos", "client", "a")) == ({"items": [1]}, True)
+    # A zero TTL keeps the entry for revalidation but never serves it as fresh
+    assert cache.get(("search", "client", "q")) == ({"items": [2]}, False)
+
+def test_cache_evicts_least_recently_used(main_module):
+    cache = main_module.ApiResponseCache(2, {})
+    cache.put(("videos", "client", "a"), {})
+    cache.put(("videos", "client", "b"), {})
+    cache.get(("videos", "client", "a"))
+    cache.put(("videos", "client", "c"), {})
+    assert cache.get(("videos", "client", "b")) is None
+    assert cache.get(("videos", "client", "a")) is not None
+
+def test_cache_invalidates_one_scope(main_module):
+    cache = main_module.ApiResponseCache(8, {})
+    cache.put(("videos", "client-1", "a"), {})
+    cache.put(("videos", "client-2", "a"), {})
+    cache.invalidate_scope("client-1")
+    assert cache.get(("videos", "client-1", "a")) is None
+    assert cache.stats()["entries"] == 1
+
+def test_stale_entry_is_revalidated_by_etag(main_module, monkeypatch):
+    main = main_module
+    cache = main.ApiResponseCache(8, {"videos": 0})
+    monkeypatch.setattr(main, "api_cache", cache)
+    cache.put(("videos", "client", "a"), {"etag": "abc", "items": [1]})
+    sent = []
+
+    async def not_modified(endpoint, params, credentials, etag=None):
+        sent.append(etag)
+        return None
+
+    monkeypatch.setattr(main, "execute_api_request", not_modified)
+    response = asyncio.run(main.execute_cached("videos", {"id": "a"}, None, ("videos", "client", "a")))
+    assert response == {"etag": "abc", "items": [1]}
+    assert sent == ["abc"]
+    assert cache.revalidations == 1
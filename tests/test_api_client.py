@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+def test_api_errors_are_raised_without_a_json_body(main_module):
+    from aiohttp import web
+
+    async def handler(request):
+        if request.path.endswith("/videos"):
+            return web.Response(status=502, text="<html>Bad Gateway</html>", content_type="text/html")
+        return web.json_response(
+            {"error": {"message": "Quota exceeded", "errors": [{"reason": "quotaExceeded"}]}},
+            status=403
+        )
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{endpoint}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        client = main_module.YouTubeApiClient(f"http://127.0.0.1:{port}", 2, 10000)
+        await client.start()
+        credentials = SimpleNamespace(token="token")
+        try:
+            with pytest.raises(main_module.YouTubeApiError) as html_error:
+                await client.get("videos", {}, credentials)
+            assert html_error.value.status == 502
+            with pytest.raises(main_module.YouTubeApiError) as json_error:
+                await client.get("playlistItems", {}, credentials)
+            assert json_error.value.status == 403
+            assert json_error.value.reason == "quotaExceeded"
+        finally:
+            await client.stop()
+            await runner.cleanup()
+
+    asyncio.run(run())
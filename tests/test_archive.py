@@ -0,0 +1,27 @@
+import pytest
+
+def test_archive_query_and_prune_are_scoped_to_the_client(main_module, tmp_path):
+    video = tmp_path / "Title [abc].mp4"
+    video.write_bytes(b"video")
+    archive = main_module.DownloadArchive(str(tmp_path / "archive.sqlite3"))
+    archive.record("client-1", "abc", str(tmp_path), "best", str(video), "checksum")
+    archive.record("client-2", "def", str(tmp_path), "best", str(video), "checksum")
+
+    assert [row["video_id"] for row in archive.query("client-1")] == ["abc"]
+    assert archive.prune("client-1") == 1
+    assert archive.query("client-1") == []
+    assert [row["video_id"] for row in archive.query("client-2")] == ["def"]
+    # Skipping looks at the folder's files, whoever downloaded them
+    assert archive.contains("def", str(tmp_path), "best")
+
+def test_pruning_everything_needs_all(main_module):
+    testclient = pytest.importorskip("fastapi.testclient")
+    main = main_module
+    main.app.dependency_overrides[main.get_credentials] = lambda: None
+    try:
+        client = testclient.TestClient(main.app)
+        client.cookies.set("client_id", "client-1")
+        assert client.delete("/archive").status_code == 400
+        assert client.delete("/archive", params={"all": "true"}).json() == {"removed": 0}
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,72 @@
+import pytest
+
+def test_capped_jobs_free_their_share_for_others(main_module):
+    governor = main_module.BandwidthGovernor(100, 0, 0)
+    governor.set_limits(job_id="slow", job_limit=10)
+    slow = governor.register("slow:1", "slow", "client-1")
+    fast = [governor.register(f"fast:{i}", "fast", "client-2") for i in range(2)]
+    assert slow.rate == 10
+    # The rest of the global limit is split between the transfers of the other job
+    assert [share.rate for share in fast] == [45, 45]
+
+def test_global_limit_is_split_evenly_between_jobs(main_module):
+    governor = main_module.BandwidthGovernor(90, 0, 0)
+    shares = [governor.register(f"job-{i}:1", f"job-{i}", "client") for i in range(3)]
+    assert [share.rate for share in shares] == [30, 30, 30]
+    governor.unregister(shares[0])
+    assert [share.rate for share in shares[1:]] == [45, 45]
+
+def test_client_limit_is_shared_by_the_clients_jobs(main_module):
+    governor = main_module.BandwidthGovernor(0, 60, 0)
+    first = governor.register("a:1", "a", "client")
+    second = governor.register("b:1", "b", "client")
+    other = governor.register("c:1", "c", "other-client")
+    assert (first.rate, second.rate, other.rate) == (30, 30, 60)
+
+def test_unlimited_transfers_are_not_throttled(main_module):
+    governor = main_module.BandwidthGovernor(0, 0, 0)
+    assert governor.register("a:1", "a", "client").rate == 0
+
+def test_clients_cannot_change_server_wide_bandwidth(main_module):
+    testclient = pytest.importorskip("fastapi.testclient")
+    main = main_module
+    main.app.dependency_overrides[main.get_credentials] = lambda: None
+    main.bandwidth_governor.default_client_limit = 1000
+    try:
+        client = testclient.TestClient(main.app)
+        client.cookies.set("client_id", "client-1")
+        response = client.put("/bandwidth", json={"globalLimit": 0})
+        assert response.status_code == 403
+        response = client.put("/bandwidth", json={"clientLimit": 0})
+        assert response.json()["client_limit"] == 1000
+        response = client.put("/bandwidth", json={"clientLimit": 500})
+        assert response.json()["client_limit"] == 500
+    finally:
+        main.app.dependency_overrides.clear()
+
+def test_job_limits_cannot_exceed_the_configured_cap(main_module):
+    governor = main_module.BandwidthGovernor(0, 0, 100)
+    governor.set_limits(job_id="a", job_limit=0)
+    governor.set_limits(job_id="b", job_limit=500)
+    governor.set_limits(job_id="c", job_limit=40)
+    assert governor.job_limits == {"a": 100, "b": 100, "c": 40}
+
+def test_finished_jobs_drop_their_limits(main_module):
+    governor = main_module.BandwidthGovernor(0, 100, 0)
+    governor.set_limits(client_id="client", client_limit=50, job_id="a", job_limit=10)
+    governor.forget("a")
+    assert governor.job_limits == {}
+    assert governor.client_limits == {"client": 50}
+    governor.forget("b", "client")
+    assert governor.client_limits == {}
+
+def test_negative_limits_are_rejected(main_module):
+    testclient = pytest.importorskip("fastapi.testclient")
+    main = main_module
+    main.app.dependency_overrides[main.get_credentials] = lambda: None
+    try:
+        client = testclient.TestClient(main.app)
+        client.cookies.set("client_id", "client-1")
+        assert client.put("/bandwidth", json={"clientLimit": -1}).status_code == 422
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+def test_dead_worker_is_detected_while_results_keep_arriving(main_module, tmp_path):
+    main = main_module
+    # Accepts connections into its backlog but never answers, so the download hangs
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    url = f"http://127.0.0.1:{server.getsockname()[1]}/video.mp4"
+
+    async def run():
+        engine = main.ProcessDownloadEngine(1, 0)
+        await engine.start()
+        busy = threading.Event()
+
+        def flood():
+            # Progress of other transfers keeps the result queue from ever timing out
+            while not busy.is_set():
+                engine._result_queue.put(("progress", "other-task", {}))
+                time.sleep(0.05)
+
+        flooder = threading.Thread(target=flood, daemon=True)
+        flooder.start()
+        try:
+            download = asyncio.create_task(engine.download(
+                {"task_id": "job:video_1", "url": url, "folder": str(tmp_path), "format": "best", "info": None},
+                None
+            ))
+            while not engine._pending:
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(1)
+            engine._slots[0]["process"].kill()
+            with pytest.raises(RuntimeError, match="exited unexpectedly"):
+                await asyncio.wait_for(download, timeout=10)
+        finally:
+            busy.set()
+            await engine.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.close()
+
+def test_worker_module_does_not_import_the_app():
+    code = "import sys, download_worker; print('main' in sys.modules, 'yt_dlp' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    assert result.stdout.split() == ["False", "False"]
@@ -0,0 +1,33 @@
+def video(duration="PT5M", views="1000", broadcast="none", rating=None):
+    content = {"duration": duration}
+    if rating:
+        content["contentRating"] = {"ytRating": rating}
+    statistics = {"viewCount": views} if views is not None else {}
+    return {"snippet": {"liveBroadcastContent": broadcast}, "contentDetails": content, "statistics": statistics}
+
+def test_parse_duration(main_module):
+    assert main_module.parse_duration("PT1H2M3S") == 3723
+    assert main_module.parse_duration("P1DT30S") == 86430
+    assert main_module.parse_duration("PT45S") == 45
+    assert main_module.parse_duration("P0D") == 0
+    assert main_module.parse_duration("") is None
+    assert main_module.parse_duration(None) is None
+    assert main_module.parse_duration("5 minutes") is None
+
+def test_filter_reason_checks_each_filter(main_module):
+    reason = main_module.filter_reason
+    assert reason(None, {}) == "unavailable"
+    assert reason(video(broadcast="live"), {"exclude_live": True}) == "live"
+    assert reason(video(broadcast="upcoming"), {"exclude_live": True}) == "upcoming"
+    assert reason(video(rating="ytAgeRestricted"), {"exclude_age_restricted": True}) == "age_restricted"
+    assert reason(video(duration="PT1H"), {"max_duration": 600}) == "too_long"
+    assert reason(video(duration="PT30S"), {"min_duration": 60}) == "too_short"
+    assert reason(video(views="10"), {"min_views": 100}) == "too_few_views"
+
+def test_filter_reason_passes_without_matching_filters(main_module):
+    reason = main_module.filter_reason
+    assert reason(video(broadcast="live", rating="ytAgeRestricted"), {}) is None
+    assert reason(video(), {"max_duration": 600, "min_duration": 60, "min_views": 100}) is None
+    # Hidden view counts and unparseable durations pass
+    assert reason(video(views=None), {"min_views": 100}) is None
+    assert reason(video(duration="unknown"), {"max_duration": 1}) is None
@@ -0,0 +1,6 @@
+def test_profile_format_without_merge_selects_single_files(main_module):
+    for name in main_module.QUALITY_PROFILES:
+        assert "+" not in main_module.profile_format(name, 10_000_000, merge=False)
+
+def test_profile_format_merges_separate_streams(main_module):
+    assert "bv*[height<=1080]+ba" in main_module.profile_format("1080p")
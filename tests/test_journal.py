@@ -0,0 +1,72 @@
+import asyncio
+
+def make_manager(main, journal):
+    return main.JobManager(1, main.download_archive, journal, 1, 1, 0)
+
+def record_downloading_job(main, journal, folder, cancelled=False):
+    manager = make_manager(main, journal)
+    job = manager.create_job("client", folder)
+    item = main.DownloadItem(job.job_id, "video_1", "https://www.youtube.com/watch?v=aaaaaaaaaaa")
+    item.status = "downloading"
+    job.items[item.item_id] = item
+    journal.record_item(item)
+    job.cancelled = cancelled
+    journal.record_job(job)
+    return job
+
+def restore(main, journal):
+    async def run():
+        manager = make_manager(main, journal)
+        manager._scheduler = main.FairScheduler(0)
+        manager._restore()
+        return manager
+
+    return asyncio.run(run())
+
+def test_restore_cancels_items_of_cancelled_jobs(main_module, tmp_path):
+    main = main_module
+    path = str(tmp_path / "restore.sqlite3")
+    job = record_downloading_job(main, main.JobJournal(path, 0, "other-host:1:a", 60), str(tmp_path), cancelled=True)
+
+    # A zero timeout treats the previous owner as dead
+    journal = main.JobJournal(path, 0, "other-host:2:b", 0)
+    restored = restore(main, journal)
+    assert restored.jobs[job.job_id].cancelled
+    assert restored.jobs[job.job_id].items["video_1"].status == "cancelled"
+    assert not restored._scheduler._backlogged()
+    assert not journal.load_unfinished()
+
+def test_restore_skips_jobs_of_live_owners(main_module, tmp_path):
+    main = main_module
+    path = str(tmp_path / "restore.sqlite3")
+    owner = main.JobJournal(path, 0, "other-host:1:a", 60)
+    job = record_downloading_job(main, owner, str(tmp_path))
+
+    journal = main.JobJournal(path, 0, "other-host:2:b", 60)
+    assert job.job_id not in restore(main, journal).jobs
+
+    # Once the owner stops sending heartbeats its jobs are taken over
+    journal.owner_timeout = 0
+    restored = restore(main, journal)
+    assert restored.jobs[job.job_id].items["video_1"].status == "queued"
+    assert not journal.load_unfinished()
+
+def test_finished_jobs_are_evicted_after_retention(main_module, tmp_path):
+    main = main_module
+    journal = main.JobJournal(str(tmp_path / "evict.sqlite3"), 0, "host:1:a", 60)
+    manager = make_manager(main, journal)
+    running = record_downloading_job(main, journal, str(tmp_path))
+    manager.jobs[running.job_id] = running
+    finished = manager.create_job("client", str(tmp_path))
+    item = main.DownloadItem(finished.job_id, "video_1", "https://www.youtube.com/watch?v=bbbbbbbbbbb")
+    item.status = "finished"
+    finished.items[item.item_id] = item
+    journal.record_item(item)
+    finished.finished_at = main.datetime.now()
+
+    cutoff = main.datetime.now() + main.timedelta(seconds=1)
+    manager._evict_finished(cutoff)
+    assert list(manager.jobs) == [running.job_id]
+    assert journal.prune(cutoff) == 1
+    assert [row[0] for row in journal._conn.execute("SELECT DISTINCT job_id FROM items")] == [running.job_id]
+    assert journal.prune(cutoff) == 0
@@ -0,0 +1,33 @@
+import asyncio
+
+def test_errors_after_extraction_settle_the_item(main_module, tmp_path, monkeypatch):
+    main = main_module
+
+    async def extract(*args, **kwargs):
+        return {"title": "Title", "filesize": 1000}
+
+    async def reserve(folder, size):
+        raise RuntimeError("statvfs failed")
+
+    monkeypatch.setattr(main, "extract_video_info", extract)
+    monkeypatch.setattr(main.disk_space, "reserve", reserve)
+
+    async def run():
+        manager = main.JobManager(1, main.download_archive, main.job_journal, 1, 1, 1)
+        manager._scheduler = main.FairScheduler(1)
+        manager._transfer_queue = asyncio.Queue(1)
+        worker = asyncio.create_task(manager._metadata_worker(0))
+        job = manager.create_job("client", str(tmp_path))
+        item = manager.enqueue(job, "https://www.youtube.com/watch?v=aaaaaaaaaaa")
+        for _ in range(100):
+            if item.status not in main.ACTIVE_ITEM_STATES:
+                break
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        return job, item, manager
+
+    job, item, manager = asyncio.run(run())
+    assert item.status == "failed"
+    assert job.status == "completed_with_errors"
+    # The client's scheduler slot is free again
+    assert manager._scheduler._active["client"] == 0
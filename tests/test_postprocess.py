@@ -0,0 +1,56 @@
+import hashlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocess
+
+def loaded_modules(_):
+    return sorted(sys.modules)
+
+def test_run_postprocess_moves_file_into_place(tmp_path):
+    staging = tmp_path / ".ytdl-staging"
+    staging.mkdir()
+    staged = staging / "Title [abc].mp4"
+    staged.write_bytes(b"video")
+
+    result = postprocess.run_postprocess({
+        "filepath": str(staged),
+        "parts": [],
+        "home": str(tmp_path),
+        "steps": [],
+        "metadata": {}
+    })
+    assert result["filepath"] == str(tmp_path / "Title [abc].mp4")
+    assert result["checksum"] == hashlib.sha256(b"video").hexdigest()
+    assert not staged.exists()
+
+def test_pool_workers_load_postprocess_without_the_app():
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        pool.submit(postprocess.file_checksum, __file__).result()
+        modules = pool.submit(loaded_modules, None).result()
+    assert "main" not in modules
+
+def test_failed_optional_steps_keep_the_file(tmp_path, monkeypatch):
+    staging = tmp_path / ".ytdl-staging"
+    staging.mkdir()
+    staged = staging / "Title [abc].mp4"
+    staged.write_bytes(b"video")
+    # An ffmpeg that always exits with an error
+    monkeypatch.setattr(postprocess.shutil, "which", lambda name: "/bin/false")
+
+    result = postprocess.run_postprocess({
+        "filepath": str(staged),
+        "parts": [],
+        "home": str(tmp_path),
+        "steps": ["remux", "metadata"],
+        "remux_format": "mkv",
+        "metadata": {"title": "Title"}
+    })
+    assert result["filepath"] == str(tmp_path / "Title [abc].mp4")
+    assert (tmp_path / "Title [abc].mp4").read_bytes() == b"video"
+    assert [note.split(":")[0] for note in result["notes"]] == ["remux", "metadata"]
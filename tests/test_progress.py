@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+def test_progress_websocket_uses_client_cookie(main_module):
+    testclient = pytest.importorskip("fastapi.testclient")
+    client = testclient.TestClient(main_module.app)
+    client.cookies.set("client_id", "client-1")
+    with client.websocket_connect("/progress") as websocket:
+        websocket.send_text("ping")
+        assert "client-1" in main_module.manager.active_connections
+
+def test_progress_websocket_requires_client_cookie(main_module):
+    testclient = pytest.importorskip("fastapi.testclient")
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as disconnect:
+        with testclient.TestClient(main_module.app).websocket_connect("/progress"):
+            pass
+    assert disconnect.value.code == 1008
+
+def test_progress_bus_forgets_finished_jobs(main_module):
+    class Connections:
+        async def broadcast_to_client(self, client_id, message):
+            return 1
+
+    async def run():
+        bus = main_module.ProgressBus(Connections(), 0.1)
+        bus.publish("client-1", {
+            'job_id': "job-1", 'video_id': "v1", 'status': 'downloading',
+            'downloaded_bytes': 10, 'total_bytes': 20, 'speed': 5
+        })
+        bus.finish_job("job-1")
+        assert bus.job_speeds() == {"job-1": 5}
+        bus.flush()
+        await asyncio.sleep(0)
+        assert bus.job_speeds() == {}
+
+    asyncio.run(run())
+
+def test_job_progress_counts_videos_not_started_yet(main_module):
+    bus = main_module.ProgressBus(None, 0.1)
+    bus.track_job("job-1", 4, "running")
+    bus.expect("job-1", "v1", 100)
+    bus.expect("job-1", "v2", 100)
+    # A merged format reports each stream separately
+    for downloaded, total in ((60, 60), (10, 40)):
+        bus.publish("client-1", {
+            'job_id': "job-1", 'video_id': "v1", 'status': 'downloading',
+            'downloaded_bytes': downloaded, 'total_bytes': total, 'speed': 10
+        })
+    bus.settle("job-1", "v3")
+
+    summary = bus._job_summary("job-1")
+    assert summary["videos"] == 4
+    assert summary["downloaded_bytes"] == 70
+    assert summary["total_bytes"] == 200
+    # v1 is 70% done, v3 is settled, v2 and v4 have not started
+    assert summary["progress"] == pytest.approx(42.5)
+    assert summary["eta"] == pytest.approx(13)
+
+    for video_id in ("v1", "v2", "v4"):
+        bus.settle("job-1", video_id)
+    bus.track_job("job-1", 4, "completed")
+    summary = bus._job_summary("job-1")
+    assert (summary["progress"], summary["status"]) == (100, "completed")
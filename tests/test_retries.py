@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+def test_limiter_halves_on_throttling(main_module):
+    async def run():
+        limiter = main_module.AdaptiveLimiter("test", 8, 3, 16, 1)
+        limiter.record_throttle()
+        await limiter.adjust()
+        assert limiter.limit == 4
+        limiter.record_throttle()
+        await limiter.adjust()
+        assert limiter.limit == 3
+
+    asyncio.run(run())
+
+def test_limiter_grows_only_while_saturated_and_paying_off(main_module):
+    async def run():
+        limiter = main_module.AdaptiveLimiter("test", 2, 1, 3, 1)
+        limiter.record_units(100)
+        await limiter.adjust()
+        assert limiter.limit == 2  # Not saturated
+        limiter.active = 2
+        limiter.record_units(100)
+        await limiter.adjust()
+        assert limiter.limit == 3
+        limiter.active = 3
+        limiter.record_units(100)
+        await limiter.adjust()
+        assert limiter.limit == 3  # At the maximum
+        limiter.limit = 2
+        limiter.active = 2
+        limiter.record_units(10)
+        await limiter.adjust()
+        assert limiter.limit == 2  # Throughput fell
+
+    asyncio.run(run())
+
+def test_breaker_opens_after_repeated_failures(main_module):
+    breaker = main_module.CircuitBreaker("test", 2, 60)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(main_module.CircuitOpenError):
+        breaker.before_call()
+
+def test_breaker_lets_one_trial_call_through(main_module):
+    breaker = main_module.CircuitBreaker("test", 1, 0)
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(main_module.CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_forbidden_is_not_throttling(main_module):
+    main = main_module
+    forbidden = Exception("ERROR: unable to download video data: HTTP Error 403: Forbidden")
+    assert not main.is_throttle_error(forbidden)
+    assert not main.is_retryable_error(forbidden)
+    assert main.is_throttle_error(Exception("HTTP Error 429: Too Many Requests"))
+
+    quota = main.YouTubeApiError(403, "quotaExceeded", "Quota exceeded")
+    assert not main.is_retryable_error(quota)
+    rate_limited = main.YouTubeApiError(403, "userRateLimitExceeded")
+    assert main.is_throttle_error(rate_limited)
+    assert main.is_retryable_error(rate_limited)
+
+def test_transfers_start_at_configured_workers(main_module):
+    assert main_module.transfer_limiter.limit == main_module.DOWNLOAD_WORKERS
+    # Enough workers are spawned for the limit to grow past its starting point
+    assert main_module.transfer_limiter.maximum == main_module.DOWNLOAD_MAX_WORKERS
+    assert main_module.job_manager.worker_count == main_module.DOWNLOAD_MAX_WORKERS
+    assert main_module.DOWNLOAD_MAX_WORKERS > main_module.DOWNLOAD_WORKERS
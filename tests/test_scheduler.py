@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+def entry(client_id, priority="normal", item_id="video"):
+    job = SimpleNamespace(client_id=client_id, priority=priority)
+    return job, SimpleNamespace(item_id=item_id, status="queued")
+
+def drain(scheduler):
+    order = []
+    while True:
+        picked = scheduler._pick()
+        if not picked:
+            return order
+        order.append(picked[0].client_id)
+
+def test_higher_priority_is_dispatched_first(main_module):
+    scheduler = main_module.FairScheduler(0)
+    scheduler.put(*entry("bulk-client", "bulk"))
+    scheduler.put(*entry("normal-client"))
+    scheduler.put(*entry("interactive-client", "interactive"))
+    assert drain(scheduler) == ["interactive-client", "normal-client", "bulk-client"]
+
+def test_clients_take_turns_in_proportion_to_weight(main_module):
+    scheduler = main_module.FairScheduler(0)
+    scheduler.weights["heavy"] = 2.0
+    for _ in range(4):
+        scheduler.put(*entry("heavy"))
+        scheduler.put(*entry("light"))
+    order = drain(scheduler)
+    assert order[:6].count("heavy") == 4
+    assert sorted(order) == ["heavy"] * 4 + ["light"] * 4
+
+def test_returning_client_does_not_jump_the_queue(main_module):
+    scheduler = main_module.FairScheduler(0)
+    for _ in range(3):
+        scheduler.put(*entry("busy"))
+    scheduler._pick()
+    scheduler._pick()
+    # An idle client that comes back starts level with the waiting ones, not at zero
+    scheduler.put(*entry("returning"))
+    scheduler.put(*entry("returning"))
+    assert drain(scheduler) == ["busy", "returning", "returning"]
+
+def test_client_quota_limits_videos_in_flight(main_module):
+    scheduler = main_module.FairScheduler(1)
+    for _ in range(2):
+        scheduler.put(*entry("client"))
+    assert scheduler._pick() is not None
+    assert scheduler._pick() is None
+    scheduler.release("client")
+    assert scheduler._pick() is not None
+
+def test_cancelled_entries_are_dropped(main_module):
+    scheduler = main_module.FairScheduler(0)
+    job, item = entry("client")
+    scheduler.put(job, item)
+    item.status = "cancelled"
+    assert scheduler._pick() is None
+    assert scheduler.qsize() == 0
+
+def test_interactive_priority_is_limited_to_small_requests(main_module):
+    request_priority = main_module.request_priority
+    assert request_priority(None, 1) == "interactive"
+    # Three sources of one video each are a batch
+    assert request_priority(None, 3) == "normal"
+    assert request_priority("interactive", 3) == "normal"
+    assert request_priority("interactive", 1) == "interactive"
+    assert request_priority("bulk", 1) == "bulk"
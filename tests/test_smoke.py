@@ -0,0 +1,3 @@
+def test_import_main(main_module):
+    paths = {route.path for route in main_module.app.routes}
+    assert {"/start-download", "/progress", "/healthz", "/readyz"} <= paths